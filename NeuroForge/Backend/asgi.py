@@ -0,0 +1,619 @@
+"""
+ASGI serving mode
+/upload, /stream_audio, /download_audio and /history run as asyncio handlers and uploads are translated
+by coroutines that offload blocking calls to a bounded executor; every other route is the Flask app
+
+Run from the Backend folder: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import os
+import json
+import collections
+import uuid
+import asyncio
+import functools
+import threading
+import contextlib
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse, FileResponse
+from starlette.routing import Route, Mount
+from a2wsgi import WSGIMiddleware
+from python_multipart.multipart import MultipartParser, parse_options_header
+from werkzeug.utils import secure_filename
+
+from app import (app as flask_app, PROCESSING_AVAILABLE, DATABASE_PATH, ALLOWED_EXTENSIONS, audio_pool,
+                 start_audio_workers, keep_early_decode, take_early_decode, batch_parents, stored_voices,
+                 open_voice_file, job_queue, translation_recorder, allowed_file, find_cached_translation,
+                 reuse_cached_translation, detect_source_language, store_voice_output,
+                 save_translation_result, wait_for_records, run_job, get_voice_output_path,
+                 get_comprehensive_language_support, build_history_query, history_page)
+from async_db import AsyncDatabase
+from job_queue import job_update
+from upload_ingest import UploadWriter, UnsupportedUpload
+
+if PROCESSING_AVAILABLE:
+    from audio_processing import (prepare_audio, iter_transcript, translate_text, split_sentences,
+                                  synthesize_speech, get_speech_recognition_lang_code, get_language_code_for_tts)
+
+logger = logging.getLogger(__name__)
+
+ASYNC_BLOCKING_THREADS = int(os.environ.get('ASYNC_BLOCKING_THREADS', 64))  # for every blocking call, all jobs
+ASYNC_MAX_JOBS = int(os.environ.get('ASYNC_MAX_JOBS', 256))  # translations running at once; more wait in memory
+ASYNC_JOB_CONCURRENCY = 4  # blocking calls one translation may have in flight
+ASYNC_STAGE_QUEUE_SIZE = 4  # recognized segments buffered ahead of translation
+
+blocking_executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_THREADS, thread_name_prefix="asgi-blocking")
+database = AsyncDatabase(DATABASE_PATH)
+
+class UploadTooLarge(Exception):
+    """The request body exceeds MAX_CONTENT_LENGTH"""
+
+async def run_blocking(function, *args):
+    """Await a blocking call on the bounded executor"""
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor, functools.partial(function, *args))
+
+_DONE = object()
+
+async def iterate_blocking(iterable, queue_size=ASYNC_STAGE_QUEUE_SIZE):
+    """Consume a blocking iterator on the executor and yield its items as each one arrives
+
+    At most `queue_size` items wait for the consumer; an exception in the
+    iterator is re-raised here, and abandoning the generator stops the producer.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(items.put(item), loop).result()
+            item = _DONE
+        except Exception as e:
+            item = e
+        if not stop.is_set():
+            asyncio.run_coroutine_threadsafe(items.put(item), loop).result()
+
+    loop.run_in_executor(blocking_executor, produce)
+    try:
+        while True:
+            item = await items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Free a producer blocked on a full queue so it sees `stop`
+        while not items.empty():
+            items.get_nowait()
+
+async def iterate_list(items):
+    """An already-known sequence as an async iterator, for code that also accepts iterate_blocking"""
+    for item in items:
+        yield item
+
+class AsyncJobRunner:
+    """Runs uploads as coroutines, at most `max_jobs` at once, with status in the jobs table
+
+    The rows are the ones the threaded JobQueue uses, so /jobs/<session_id>
+    works unchanged, and jobs cut short by a restart are resumed by JobQueue.
+    """
+
+    def __init__(self, max_jobs=ASYNC_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self.active = {}  # session_id -> task, running or waiting for a slot
+        self._slots = None
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.max_jobs)
+
+    def waiting(self):
+        """Jobs accepted but not yet running"""
+        return max(0, len(self.active) - self.max_jobs)
+
+    async def enqueue(self, session_id, params):
+        await database.execute(
+            "INSERT INTO jobs (session_id, params) VALUES (?, ?)", (session_id, json.dumps(params))
+        )
+        self.active[session_id] = asyncio.create_task(self._run(session_id, params))
+        logger.info(f"Job queued: {session_id} ({len(self.active)} in flight)")
+
+    async def _update(self, session_id, **fields):
+        await database.execute(*job_update(session_id, fields))
+
+    async def _run(self, session_id, params):
+        try:
+            async with self._slots:
+                await self._update(session_id, status='processing', stage='speech_to_text', progress=5, attempts=1)
+
+                async def report(stage, progress):
+                    await self._update(session_id, stage=stage, progress=int(progress))
+
+                try:
+                    result = await translate_upload(session_id, params, report)
+                    await self._update(session_id, status='completed', stage='completed', progress=100,
+                                       result=json.dumps(result))
+                    logger.info(f"✅ Job completed: {session_id}")
+                except Exception as e:
+                    logger.error(f"❌ Job failed: {session_id}: {e}")
+                    await self._update(session_id, status='failed', error=str(e))
+        finally:
+            self.active.pop(session_id, None)
+
+job_runner = AsyncJobRunner()
+
+async def voice_transcript(transcript, src_lang, target_lang, tts_lang, voice_type, out_file, report):
+    """Translate recognized segments and voice their sentences, appending MP3 to `out_file` in order
+
+    `transcript` is an async iterator of segments, consumed while recognition
+    is still running. Like iter_transcript, at most ASYNC_JOB_CONCURRENCY
+    segments are in flight, and blocking calls are limited to that many at a
+    time, so the file grows while later segments are still being recognized.
+    Returns (segments, translated_text, audio_written, voice_complete).
+    """
+    limit = asyncio.Semaphore(ASYNC_JOB_CONCURRENCY)
+
+    async def limited(function, *args):
+        async with limit:
+            return await run_blocking(function, *args)
+
+    async def translate(segment):
+        translated = await limited(translate_text, segment['text'], src_lang, target_lang) \
+            if src_lang != target_lang else segment['text']
+        if translated.startswith('Translation error'):
+            logger.warning(f"Segment {segment['index']} not translated: {translated}")
+            return translated, []
+        return translated, [
+            asyncio.create_task(limited(synthesize_speech, sentence, tts_lang, voice_type))
+            for sentence in split_sentences(translated)
+        ]
+
+    segments = []
+    translated_parts = []
+    in_flight = collections.deque()
+    state = {'audio_written': False, 'voice_complete': True}
+
+    async def write_next(output):
+        segment, task = in_flight.popleft()
+        translated, fragments = await task
+        translated_parts.append(translated)
+        if translated.startswith('Translation error'):
+            state['voice_complete'] = False
+        try:
+            for fragment in fragments:
+                try:
+                    data = await fragment
+                except Exception as e:
+                    logger.warning(f"TTS failed for a sentence: {e}")
+                    state['voice_complete'] = False
+                    continue
+                output.write(data)
+                output.flush()
+                state['audio_written'] = True
+        finally:
+            for fragment in fragments:
+                fragment.cancel()
+        await report('text_to_speech', 10 + 80 * (segment['index'] + 1) / segment['count'])
+
+    try:
+        # MP3 frames are self-contained, so fragments can simply be appended
+        with open(out_file, 'wb') as output:
+            async for segment in transcript:
+                segments.append({'start': segment['start'], 'end': segment['end'], 'text': segment['text']})
+                in_flight.append((segment, asyncio.create_task(translate(segment))))
+                if len(in_flight) >= ASYNC_JOB_CONCURRENCY:
+                    await write_next(output)
+            while in_flight:
+                await write_next(output)
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+        await transcript.aclose()
+    return segments, ' '.join(translated_parts), state['audio_written'], state['voice_complete']
+
+async def translate_upload(session_id, params, report):
+    """Asyncio counterpart of run_translation_pipeline for one uploaded file
+
+    Produces the same result payload and translations row.
+    """
+    if not PROCESSING_AVAILABLE:
+        return await run_blocking(run_job, session_id, params, lambda stage, progress: None)
+
+    start_time = datetime.now()
+    source_language = params['source_language']
+    target_language = params['target_language']
+    voice_type = params['voice_type']
+    outcome = {
+        'original_text': "",
+        'segments': [],
+        'translated_text': "",
+        'detected_source_language': source_language,
+        'confidence_score': 0.0,
+        'translated_audio_path': None,
+        'audio_duration': 0.0
+    }
+
+    try:
+        early_pcm = await run_blocking(take_early_decode, session_id)
+        prepared_audio = await run_blocking(prepare_audio, params['file_path'], early_pcm)
+
+        # Step 1: Language detection
+        detected_source_lang, confidence_score, transcript = await run_blocking(
+            detect_source_language, prepared_audio, source_language
+        )
+        outcome.update(detected_source_language=detected_source_lang, confidence_score=confidence_score)
+
+        if detected_source_lang == 'unknown':
+            outcome['original_text'] = "Could not detect language or extract text from audio"
+            outcome['translated_text'] = "Translation failed due to language detection issues"
+        else:
+            # Steps 2-4: Speech recognition, translation and voice generation, overlapped per segment
+            await report('speech_to_text', 10)
+            sr_lang = get_speech_recognition_lang_code(detected_source_lang)
+            segments = iterate_list(transcript) if transcript is not None \
+                else iterate_blocking(iter_transcript(prepared_audio, sr_lang))
+
+            tts_lang_code = get_language_code_for_tts(target_language)
+            output_path = get_voice_output_path(session_id)
+            recognized, translated_text, audio_written, voice_complete = await voice_transcript(
+                segments, detected_source_lang, target_language, tts_lang_code, voice_type, output_path, report
+            )
+            translated_audio_path, audio_duration = await run_blocking(
+                store_voice_output, session_id, output_path, translated_text, tts_lang_code, voice_type, audio_written,
+                voice_complete
+            )
+
+            if not recognized:
+                outcome['original_text'] = f"Could not understand audio in {sr_lang}"
+                outcome['translated_text'] = "Translation failed due to language detection issues"
+            else:
+                outcome.update(segments=recognized, original_text=' '.join(segment['text'] for segment in recognized),
+                               translated_text=translated_text, translated_audio_path=translated_audio_path,
+                               audio_duration=audio_duration)
+
+    except Exception as e:
+        logger.error(f"Processing error: {e}")
+        outcome.update(
+            original_text=f"Processing failed for {params['filename']}: {str(e)}",
+            translated_text="Error: Could not process audio file",
+            translated_audio_path=None
+        )
+
+    await report('saving', 90)
+    result = await run_blocking(save_translation_result, session_id, params, start_time, outcome)
+    await run_blocking(wait_for_records, [session_id])
+    return result
+
+async def read_upload_form(request):
+    """Parse a multipart body as it arrives: file parts stream into UploadWriters, fields are collected
+
+    Each received chunk is parsed on the executor, since writing, hashing and
+    feeding the early decoder block. Returns (form, files): form maps a field
+    name to its values, files maps it to (filename, UploadWriter). Raises
+    UnsupportedUpload, UploadTooLarge or ValueError for a malformed body.
+    """
+    content_type, options = parse_options_header(request.headers.get('content-type', ''))
+    boundary = options.get(b'boundary')
+    if content_type != b'multipart/form-data' or not boundary:
+        raise ValueError("Expected a multipart/form-data body")
+
+    form = {}
+    files = {}
+    part = {}
+    header = {'field': b'', 'value': b''}
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, data=bytearray(), writer=None)
+
+    def on_header_field(data, start, end):
+        header['field'] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header['value'] += data[start:end]
+
+    def on_header_end():
+        part['headers'][header['field'].lower()] = header['value']
+        header['field'] = header['value'] = b''
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part['headers'].get(b'content-disposition', b''))
+        part['name'] = disposition.get(b'name', b'').decode('utf-8', 'replace')
+        filename = disposition.get(b'filename')
+        if filename is not None:
+            if part['name'] in files:
+                files[part['name']][1].close()
+            part['writer'] = UploadWriter(flask_app.config['UPLOAD_FOLDER'],
+                                          early_decode=flask_app.config['EARLY_DECODE'])
+            files[part['name']] = (filename.decode('utf-8', 'replace'), part['writer'])
+
+    def on_part_data(data, start, end):
+        if part['writer']:
+            part['writer'].write(bytes(data[start:end]))
+        else:
+            part['data'] += data[start:end]
+
+    def on_part_end():
+        if part['writer']:
+            part['writer'].seek(0)  # sniffs parts shorter than SNIFF_BYTES, like Werkzeug's rewind
+        else:
+            form.setdefault(part['name'], []).append(part['data'].decode('utf-8', 'replace'))
+
+    parser = MultipartParser(boundary, callbacks={
+        'on_part_begin': on_part_begin,
+        'on_header_field': on_header_field,
+        'on_header_value': on_header_value,
+        'on_header_end': on_header_end,
+        'on_headers_finished': on_headers_finished,
+        'on_part_data': on_part_data,
+        'on_part_end': on_part_end
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > flask_app.config['MAX_CONTENT_LENGTH']:
+                raise UploadTooLarge(f"Upload exceeds {flask_app.config['MAX_CONTENT_LENGTH']} bytes")
+            if chunk:
+                await run_blocking(parser.write, chunk)
+        await run_blocking(parser.finalize)
+    except Exception:
+        for _, writer in files.values():
+            writer.close()
+        raise
+    return form, files
+
+def form_value(form, name, default):
+    values = form.get(name)
+    return values[0] if values else default
+
+def overloaded_response():
+    """A 503 with Retry-After when new uploads would only pile up, otherwise None"""
+    waiting = job_runner.waiting()
+    if waiting >= flask_app.config['MAX_QUEUED_JOBS']:
+        reason = f"{waiting} uploads are waiting to be processed"
+    elif audio_pool and audio_pool.saturated():
+        reason = "all audio workers are busy"
+    else:
+        return None
+
+    logger.warning(f"⚠️ Turning away upload: {reason}")
+    return JSONResponse(
+        {'error': f'Server busy: {reason}. Please retry later.'},
+        status_code=503,
+        headers={'Retry-After': str(flask_app.config['RETRY_AFTER_SECONDS'])}
+    )
+
+async def upload_file(request):
+    """Async /upload: same form fields and responses as the Flask route"""
+    start_time = datetime.now()
+
+    busy = overloaded_response()
+    if busy:
+        return busy
+
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > flask_app.config['MAX_CONTENT_LENGTH']:
+        return JSONResponse({'error': 'File too large'}, status_code=413)
+
+    # Parsing streams file parts to disk and rejects non-media content early
+    try:
+        form, files = await read_upload_form(request)
+    except UnsupportedUpload as e:
+        return JSONResponse({'error': str(e)}, status_code=415)
+    except UploadTooLarge as e:
+        return JSONResponse({'error': str(e)}, status_code=413)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    try:
+        if 'file' not in files:
+            return JSONResponse({'error': 'No file provided'}, status_code=400)
+
+        original_filename, upload = files['file']
+        source_language = form_value(form, 'source_language', 'auto')
+        target_language = form_value(form, 'target_language', 'en')
+        voice_type = form_value(form, 'voice_type', 'standard')
+
+        if original_filename == '':
+            return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+        if not allowed_file(original_filename):
+            return JSONResponse({
+                'error': f'File type not supported. Allowed formats: {", ".join(ALLOWED_EXTENSIONS)}'
+            }, status_code=400)
+
+        session_id = str(uuid.uuid4())
+        filename = secure_filename(original_filename)
+        unique_filename = f"{session_id}_{filename}"
+        file_path = os.path.join(flask_app.config['UPLOAD_FOLDER'], unique_filename)
+        early_decoder = await run_blocking(upload.claim, file_path)
+        file_size, content_hash = upload.size, upload.content_hash
+        logger.info(f"File saved: {unique_filename} ({file_size} bytes, {upload.media_type})")
+
+        # Byte-identical re-uploads (client retries) reuse the earlier result
+        cached = await run_blocking(find_cached_translation, content_hash, source_language, target_language, voice_type)
+        if cached:
+            if early_decoder:
+                await run_blocking(early_decoder.abort)
+            await run_blocking(os.remove, file_path)
+            return JSONResponse(await run_blocking(
+                reuse_cached_translation, cached, session_id, filename, file_size, content_hash, start_time
+            ))
+
+        keep_early_decode(session_id, early_decoder)
+
+        await job_runner.enqueue(session_id, {
+            'file_path': file_path,
+            'filename': filename,
+            'file_size': file_size,
+            'content_hash': content_hash,
+            'source_language': source_language,
+            'target_language': target_language,
+            'voice_type': voice_type
+        })
+
+        return JSONResponse({
+            'status': 'queued',
+            'session_id': session_id,
+            'file_size': file_size,
+            'status_url': f'/jobs/{session_id}',
+            'result_url': f'/jobs/{session_id}/result'
+        }, status_code=202)
+
+    except Exception as e:
+        logger.error(f"Upload processing failed: {e}")
+        return JSONResponse({'error': f'Processing failed: {str(e)}'}, status_code=500)
+    finally:
+        for _, writer in files.values():
+            writer.close()
+
+async def job_in_progress(session_id):
+    if session_id in stored_voices:
+        return False  # the voice is final; its job is only saving the row
+    session_id = batch_parents.get(session_id, session_id)  # batch targets follow the batch's job
+    if session_id in job_runner.active:
+        return True
+    # Resumed and batch jobs run on the threaded queue
+    row = await database.fetchone("SELECT status FROM jobs WHERE session_id = ?", (session_id,))
+    return row is not None and row['status'] in ('queued', 'processing')
+
+async def get_translation_record(session_id, columns):
+    """A session's translation row, including rows still queued for writing, or None"""
+    pending = translation_recorder.pending(session_id)
+    if pending:
+        return pending
+    return await database.fetchone(f"SELECT {columns} FROM translations WHERE session_id = ?", (session_id,))
+
+async def follow_audio_file(session_id, file_path):
+    """Yield MP3 bytes from a file that is still being written, until its job finishes"""
+    chunk_size = flask_app.config['STREAM_CHUNK_SIZE']
+    loop = asyncio.get_running_loop()
+    idle_since = loop.time()
+    audio_file = None
+
+    try:
+        while True:
+            if audio_file is None:
+                audio_file = await run_blocking(open_voice_file, session_id, file_path)
+
+            data = await run_blocking(audio_file.read, chunk_size) if audio_file else b''
+            if data:
+                idle_since = loop.time()
+                yield data
+                continue
+
+            # Caught up with the writer: stop once the job is done and the file is drained
+            if not await job_in_progress(session_id):
+                if audio_file is None:
+                    # The voice was stored before this stream opened the live file
+                    audio_file = await run_blocking(open_voice_file, session_id, file_path, True)
+                    if audio_file:
+                        continue
+                    return
+                remaining = await run_blocking(audio_file.read)
+                if remaining:
+                    yield remaining
+                return
+
+            if loop.time() - idle_since > flask_app.config['STREAM_IDLE_TIMEOUT']:
+                logger.warning(f"Live audio stream idle too long: {session_id}")
+                return
+            await asyncio.sleep(0.25)
+    finally:
+        if audio_file:
+            audio_file.close()
+
+async def stream_audio(request):
+    """Async /stream_audio: progressive while the job runs, then the finished file with Range support"""
+    session_id = request.path_params['session_id']
+    try:
+        if await job_in_progress(session_id):
+            return StreamingResponse(
+                follow_audio_file(session_id, get_voice_output_path(session_id)),
+                media_type='audio/mpeg',
+                headers={'Cache-Control': 'no-cache', 'X-Audio-Complete': 'false'}
+            )
+
+        if session_id in stored_voices:
+            result = {'translated_audio_path': stored_voices[session_id]}
+        else:
+            result = await get_translation_record(session_id, "translated_audio_path")
+        if result and result['translated_audio_path'] and os.path.exists(result['translated_audio_path']):
+            return FileResponse(result['translated_audio_path'], media_type='audio/mpeg')
+        return JSONResponse({'error': 'Audio file not found'}, status_code=404)
+
+    except Exception as e:
+        logger.error(f"Audio streaming failed: {e}")
+        return JSONResponse({'error': 'Streaming failed'}, status_code=500)
+
+async def download_audio(request):
+    """Async /download_audio"""
+    session_id = request.path_params['session_id']
+    try:
+        result = await get_translation_record(
+            session_id, "translated_audio_path, target_language, detected_source_language"
+        )
+        if result and result['translated_audio_path'] and os.path.exists(result['translated_audio_path']):
+            all_languages = get_comprehensive_language_support()
+            source_lang_name = all_languages.get(result['detected_source_language'], 'Unknown')
+            target_lang_name = all_languages.get(result['target_language'], 'Unknown')
+            download_name = f"voice_translation_{source_lang_name}_to_{target_lang_name}_{session_id}.mp3"
+            return FileResponse(result['translated_audio_path'], media_type='audio/mpeg', filename=download_name)
+        return JSONResponse({'error': 'Audio file not found'}, status_code=404)
+
+    except Exception as e:
+        logger.error(f"Audio download failed: {e}")
+        return JSONResponse({'error': 'Download failed'}, status_code=500)
+
+async def get_history(request):
+    """Async /history: same parameters and paging as the Flask route"""
+    try:
+        history_query, error = build_history_query(request.query_params)
+        if error:
+            return JSONResponse(error, status_code=400)
+        query, values, fields, limit = history_query
+        rows = await database.fetchall(query, values)
+        return JSONResponse(history_page(rows, fields, limit))
+
+    except Exception as e:
+        logger.error(f"History retrieval failed: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@contextlib.asynccontextmanager
+async def lifespan(application):
+    await database.open()
+    job_runner.start()
+    await run_blocking(start_audio_workers)
+    # Jobs left unfinished by the last run, and /upload_batch jobs, run on the threaded queue
+    await run_blocking(job_queue.start)
+    logger.info("🚀 NeuroForge ASGI mode: async /upload, /stream_audio, /download_audio and /history")
+    yield
+    await database.close()
+
+application = Starlette(
+    routes=[
+        Route('/upload', upload_file, methods=['POST']),
+        Route('/stream_audio/{session_id}', stream_audio),
+        Route('/download_audio/{session_id}', download_audio),
+        Route('/history', get_history),
+        # Pages, auth, jobs, batches, search and the rest stay on Flask
+        Mount('/', app=WSGIMiddleware(flask_app))
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=5000)
@@ -0,0 +1,77 @@
+"""
+Async SQLite access for the ASGI serving mode
+A few aiosqlite connections, each on its own thread, shared by every request through an asyncio queue
+"""
+
+import asyncio
+import sqlite3
+import logging
+import aiosqlite
+from db_pool import DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_CACHE_SIZE_KB, DB_STATEMENT_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DB_CONNECTIONS = 4  # WAL lets these read alongside the job workers' writes
+
+class AsyncDatabase:
+    """Pooled aiosqlite connections with the same pragmas as db_pool.connect
+
+    Queries never block the event loop, and the thread count stays at the
+    pool size however many requests are waiting.
+    """
+
+    def __init__(self, database_path, size=ASYNC_DB_CONNECTIONS):
+        self.database_path = database_path
+        self.size = size
+        self._idle = None
+        self._connections = []
+
+    async def open(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            connection = await aiosqlite.connect(
+                self.database_path, timeout=DB_BUSY_TIMEOUT_MS / 1000.0, cached_statements=DB_STATEMENT_CACHE_SIZE
+            )
+            connection.row_factory = sqlite3.Row
+            await connection.execute("PRAGMA journal_mode=WAL")
+            await connection.execute("PRAGMA synchronous=NORMAL")
+            await connection.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+            await connection.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+            await connection.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+            await connection.execute("PRAGMA temp_store=MEMORY")
+            self._connections.append(connection)
+            self._idle.put_nowait(connection)
+
+    async def _run(self, method, query, values):
+        connection = await self._idle.get()
+        try:
+            return await method(connection, query, values)
+        finally:
+            if connection.in_transaction:
+                await connection.rollback()
+            self._idle.put_nowait(connection)
+
+    async def fetchone(self, query, values=()):
+        async def fetch(connection, query, values):
+            async with connection.execute(query, values) as cursor:
+                return await cursor.fetchone()
+        return await self._run(fetch, query, values)
+
+    async def fetchall(self, query, values=()):
+        async def fetch(connection, query, values):
+            async with connection.execute(query, values) as cursor:
+                return await cursor.fetchall()
+        return await self._run(fetch, query, values)
+
+    async def execute(self, query, values=()):
+        """Run one write statement in its own transaction; returns the affected row count"""
+        async def write(connection, query, values):
+            cursor = await connection.execute(query, values)
+            await connection.commit()
+            return cursor.rowcount
+        return await self._run(write, query, values)
+
+    async def close(self):
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
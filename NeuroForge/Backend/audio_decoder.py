@@ -0,0 +1,189 @@
+"""
+Single-pass audio decoding with ffmpeg
+ffmpeg decodes, downmixes and resamples in one step and streams 16 kHz mono s16le PCM through a pipe
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import logging
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+DECODE_SAMPLE_RATE = 16000
+DECODE_SAMPLE_WIDTH = 2            # s16le
+DECODE_CHUNK_BYTES = 64 * 1024     # bytes per pipe read, and spare room kept at the end of the buffer
+DECODE_INITIAL_SECONDS = 60        # buffer preallocated when the duration is not known
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+def _ffmpeg_command(file_path, sample_rate):
+    return [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", file_path,
+        "-vn", "-sn", "-dn",           # never decode video, subtitle or data streams
+        "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "pipe:1"
+    ]
+
+def _finish(process, file_path):
+    stderr = process.stderr.read().decode('utf-8', errors='replace').strip()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg could not decode {os.path.basename(file_path)}: {stderr or process.returncode}")
+
+def decode_pcm(file_path, sample_rate=DECODE_SAMPLE_RATE, expected_seconds=None):
+    """Decode a whole file to mono s16le bytes, reading the pipe into a preallocated buffer
+
+    `expected_seconds` (e.g. from container metadata) sizes the buffer so it is
+    normally filled without reallocating; it doubles if the guess is short.
+    """
+    bytes_per_second = sample_rate * DECODE_SAMPLE_WIDTH
+    capacity = int((expected_seconds or DECODE_INITIAL_SECONDS) * bytes_per_second) + DECODE_CHUNK_BYTES
+    buffer = bytearray(capacity)
+    size = 0
+
+    process = subprocess.Popen(
+        _ffmpeg_command(file_path, sample_rate), stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        while True:
+            if len(buffer) - size < DECODE_CHUNK_BYTES:
+                buffer.extend(bytes(len(buffer)))
+            with memoryview(buffer) as view, view[size:size + DECODE_CHUNK_BYTES] as window:
+                read = process.stdout.readinto(window)
+            if not read:
+                break
+            size += read
+        _finish(process, file_path)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    # Drop the unused tail (and any odd trailing byte) in place
+    del buffer[size - size % DECODE_SAMPLE_WIDTH:]
+    return buffer
+
+def decode_audio(file_path, sample_rate=DECODE_SAMPLE_RATE, expected_seconds=None):
+    """16 kHz mono 16-bit AudioSegment for any audio or video file
+
+    Uses a single ffmpeg pass when ffmpeg is installed; otherwise pydub decodes
+    at the native format and the caller's conversion steps still apply.
+    """
+    if not ffmpeg_available():
+        file_format = os.path.splitext(file_path)[1][1:].lower()
+        return AudioSegment.from_file(file_path, format=file_format)
+
+    # AudioSegment takes the bytearray as is, so the PCM is never copied
+    pcm = decode_pcm(file_path, sample_rate, expected_seconds=expected_seconds)
+    return segment_from_pcm(pcm, sample_rate)
+
+class StreamingDecoder:
+    """Decode a file while its bytes are still arriving
+
+    Bytes passed to feed() go to ffmpeg's stdin and a reader thread spools the
+    PCM to `spill_path`, so decoding runs alongside the upload and a decoder
+    waiting for its job holds no audio in memory. Only formats that can be
+    decoded without seeking work this way (not MP4/MOV, whose index may sit at
+    the end of the file).
+    """
+
+    def __init__(self, spill_path, sample_rate=DECODE_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.spill_path = spill_path
+        self.failed = False
+        command = _ffmpeg_command("pipe:0", sample_rate)
+        self._spill = open(spill_path, 'wb')
+        try:
+            # stderr is never read, so a pipe there could fill up and stall ffmpeg
+            self._process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        except OSError:
+            self._spill.close()
+            self._remove_spill()
+            raise
+        self._reader = threading.Thread(target=self._read, name="streaming-decoder", daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        try:
+            while True:
+                chunk = self._process.stdout.read(DECODE_CHUNK_BYTES)
+                if not chunk:
+                    return
+                self._spill.write(chunk)
+        except (OSError, ValueError):
+            self.failed = True
+        finally:
+            self._spill.close()
+
+    def feed(self, data):
+        """Pass more input bytes to ffmpeg; a decoder error only disables early decoding"""
+        if self.failed:
+            return
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            self.failed = True
+
+    def end_input(self):
+        """Mark the input complete without waiting; ffmpeg drains in the background"""
+        try:
+            self._process.stdin.close()
+        except OSError:
+            self.failed = True
+
+    def finish(self, timeout=60):
+        """Mono s16le PCM of the whole input, or None if ffmpeg could not decode it
+
+        Waits for ffmpeg to finish, so call it from the job, not the request.
+        """
+        self.end_input()
+        self._reader.join(timeout)
+        try:
+            self._process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.abort()
+            return None
+        if self.failed or self._process.returncode != 0 or self._reader.is_alive():
+            self.abort()
+            return None
+        self._process.stdout.close()
+
+        try:
+            with open(self.spill_path, 'rb') as spill:
+                size = os.fstat(spill.fileno()).st_size
+                pcm = bytearray(size - size % DECODE_SAMPLE_WIDTH)
+                spill.readinto(pcm)
+        finally:
+            self._remove_spill()
+        return pcm
+
+    def abort(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        for pipe in (self._process.stdin, self._process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self._reader.join(1)
+        self._remove_spill()
+
+    def _remove_spill(self):
+        try:
+            os.remove(self.spill_path)
+        except FileNotFoundError:
+            pass
+
+def segment_from_pcm(pcm, sample_rate=DECODE_SAMPLE_RATE):
+    """AudioSegment over mono s16le PCM from decode_pcm or StreamingDecoder"""
+    return AudioSegment(data=pcm, sample_width=DECODE_SAMPLE_WIDTH, frame_rate=sample_rate, channels=1)
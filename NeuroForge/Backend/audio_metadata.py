@@ -0,0 +1,250 @@
+"""
+Cheap audio metadata from container headers
+MP3 frame headers (our TTS output) and WAV headers are parsed natively; other formats go to ffprobe
+Results are cached per file path, modification time and size
+"""
+
+import os
+import json
+import wave
+import struct
+import shutil
+import threading
+import subprocess
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_SIZE = 4096
+FFPROBE_TIMEOUT = 10
+MP3_HEADER_READ_BYTES = 64 * 1024  # enough to find the first frames after an ID3 tag
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# MPEG audio tables, indexed by version (1, 2, 2.5) and layer
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+_LAYERS = {1: 3, 2: 2, 3: 1}
+
+def _parse_frame_header(data, offset):
+    """(frame_length, samples_per_frame, sample_rate, bitrate_kbps, channels, version) or None"""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    version = _VERSIONS.get((b1 >> 3) & 3)
+    layer = _LAYERS.get((b1 >> 1) & 3)
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if (layer == 2 or version == 1) else 576
+        frame_length = samples_per_frame // 8 * bitrate * 1000 // sample_rate + padding
+    return frame_length, samples_per_frame, sample_rate, bitrate, channels, version
+
+def _id3v2_size(header):
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+def _mp3_metadata(file_path, file_size):
+    with open(file_path, 'rb') as f:
+        audio_start = _id3v2_size(f.read(10))
+        f.seek(audio_start)
+        data = f.read(MP3_HEADER_READ_BYTES)
+        f.seek(max(file_size - 128, 0))
+        audio_end = file_size - 128 if f.read(3) == b'TAG' else file_size
+
+    # First frame whose successor also parses, so stray 0xFF bytes are not mistaken for a header
+    offset, header = 0, None
+    while offset < len(data) - 4:
+        header = _parse_frame_header(data, offset)
+        if header and (offset + header[0] + 4 > len(data) or _parse_frame_header(data, offset + header[0])):
+            break
+        header = None
+        offset += 1
+    if not header:
+        raise ValueError("no MPEG audio frames found")
+
+    frame_length, samples_per_frame, sample_rate, bitrate, channels, version = header
+    audio_start += offset
+    audio_bytes = audio_end - audio_start
+
+    # Xing/Info (LAME) or VBRI tag in the first frame
+    side_info = (17 if channels == 1 else 32) if version == 1 else (9 if channels == 1 else 17)
+    tag_offset = offset + 4 + side_info
+    frames = tag_bytes = None
+    cbr = True
+    if data[tag_offset:tag_offset + 4] in (b'Xing', b'Info'):
+        cbr = data[tag_offset:tag_offset + 4] == b'Info'
+        flags = struct.unpack('>I', data[tag_offset + 4:tag_offset + 8])[0]
+        position = tag_offset + 8
+        if flags & 1:
+            frames = struct.unpack('>I', data[position:position + 4])[0]
+            position += 4
+        if flags & 2:
+            tag_bytes = struct.unpack('>I', data[position:position + 4])[0]
+    elif data[offset + 36:offset + 40] == b'VBRI':
+        cbr = False
+        tag_bytes, frames = struct.unpack('>II', data[offset + 46:offset + 54])
+
+    # Concatenated TTS fragments carry the first fragment's tag, so only trust
+    # a tag whose byte count covers the whole stream
+    if frames and tag_bytes and abs(tag_bytes - audio_bytes) <= 0.02 * audio_bytes:
+        duration = frames * samples_per_frame / sample_rate
+    elif cbr and _constant_bitrate(data, offset, bitrate):
+        duration = audio_bytes * 8 / (bitrate * 1000)
+    else:
+        duration = _walk_frames(file_path, audio_start, audio_end)
+
+    return {
+        'duration': duration,
+        'channels': channels,
+        'frame_rate': sample_rate,
+        'sample_width': 2,  # decoders produce 16-bit PCM
+        'codec': 'mp3',
+        'bitrate': bitrate * 1000
+    }
+
+def _constant_bitrate(data, offset, bitrate, frames=8):
+    """True when the first few frames all share `bitrate`"""
+    for _ in range(frames):
+        header = _parse_frame_header(data, offset)
+        if not header:
+            break
+        if header[3] != bitrate:
+            return False
+        offset += header[0]
+    return True
+
+def _walk_frames(file_path, audio_start, audio_end):
+    """Sum frame durations across a VBR stream (header reads only)"""
+    with open(file_path, 'rb') as f:
+        f.seek(audio_start)
+        data = f.read(audio_end - audio_start)
+    duration = 0.0
+    offset = 0
+    while offset < len(data) - 4:
+        header = _parse_frame_header(data, offset)
+        if not header or header[0] <= 0:
+            offset += 1  # resync after garbage or an embedded tag
+            continue
+        duration += header[1] / header[2]
+        offset += header[0]
+    return duration
+
+def _wav_metadata(file_path):
+    with wave.open(file_path, 'rb') as wav:
+        return {
+            'duration': wav.getnframes() / float(wav.getframerate()),
+            'channels': wav.getnchannels(),
+            'frame_rate': wav.getframerate(),
+            'sample_width': wav.getsampwidth(),
+            'codec': 'pcm',
+            'bitrate': wav.getframerate() * wav.getnchannels() * wav.getsampwidth() * 8
+        }
+
+def _ffprobe_metadata(file_path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "format=duration,bit_rate:stream=codec_name,channels,sample_rate,bits_per_sample,duration",
+         "-of", "json", file_path],
+        capture_output=True, timeout=FFPROBE_TIMEOUT
+    )
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode('utf-8', errors='replace').strip() or "ffprobe failed")
+
+    probe = json.loads(result.stdout or b'{}')
+    streams = probe.get('streams') or [{}]
+    stream, container = streams[0], probe.get('format', {})
+    if not streams[0]:
+        raise ValueError("no audio stream")
+    return {
+        'duration': float(container.get('duration') or stream.get('duration') or 0.0),
+        'channels': int(stream.get('channels') or 0),
+        'frame_rate': int(stream.get('sample_rate') or 0),
+        'sample_width': int(stream.get('bits_per_sample') or 16) // 8,
+        'codec': stream.get('codec_name'),
+        'bitrate': int(container.get('bit_rate') or 0)
+    }
+
+def _decoded_metadata(file_path):
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(file_path)
+    return {
+        'duration': len(audio) / 1000.0,
+        'channels': audio.channels,
+        'frame_rate': audio.frame_rate,
+        'sample_width': audio.sample_width,
+        'codec': None,
+        'bitrate': None
+    }
+
+def _read_metadata(file_path, file_size, allow_decode):
+    extension = os.path.splitext(file_path)[1][1:].lower()
+    readers = []
+    if extension == 'mp3':
+        readers.append(lambda: _mp3_metadata(file_path, file_size))
+    if extension == 'wav':
+        readers.append(lambda: _wav_metadata(file_path))
+    if shutil.which("ffprobe"):
+        readers.append(lambda: _ffprobe_metadata(file_path))
+    if allow_decode:
+        readers.append(lambda: _decoded_metadata(file_path))
+
+    for reader in readers:
+        try:
+            return reader()
+        except Exception as e:
+            logger.debug(f"Metadata reader failed for {file_path}: {e}")
+    return None
+
+def get_audio_metadata(file_path, allow_decode=True):
+    """Duration, channels, rate, sample width, format and size of an audio file, or None
+
+    Header parsing takes milliseconds regardless of length. A full decode is
+    only the last resort (skip it with `allow_decode=False`).
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+
+    key = os.path.abspath(file_path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            _cache.move_to_end(key)
+            return dict(cached[1])
+
+    metadata = _read_metadata(file_path, stat.st_size, allow_decode)
+    if metadata is None:
+        return None
+    metadata['format'] = os.path.splitext(file_path)[1][1:].upper()
+    metadata['file_size'] = stat.st_size
+
+    with _cache_lock:
+        _cache[key] = ((stat.st_mtime_ns, stat.st_size), metadata)
+        _cache.move_to_end(key)
+        while len(_cache) > METADATA_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(metadata)
@@ -1,9 +1,24 @@
 import os
+import io
+import re
+import shutil
+import math
+import audioop
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import speech_recognition as sr
 from deep_translator import GoogleTranslator
 from gtts import gTTS
 from pydub import AudioSegment
 import logging
+from language_detection import detect_language_parallel, length_confidence
+from language_id import rank_languages
+from audio_decoder import decode_audio, segment_from_pcm
+from audio_metadata import get_audio_metadata
+from dsp import normalize, high_pass_filter, compress_dynamic_range, set_channels, set_frame_rate
+from translation_cache import translation_cache
+from tts_store import tts_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,7 +27,8 @@ logger = logging.getLogger(__name__)
 AudioSegment.converter = "ffmpeg"
 AudioSegment.ffprobe = "ffprobe"
 
-logger.info("✅ FFmpeg configured for Render")
+if shutil.which("ffmpeg"):
+    logger.info("✅ FFmpeg configured for Render")
 else:
     logger.warning("⚠️ FFmpeg not found. Audio conversion may fail.")
 
@@ -25,57 +41,290 @@ recognizer.operation_timeout = None
 recognizer.phrase_timeout = None
 recognizer.non_speaking_duration = 0.5
 
-def audio_to_text(file_path, src_lang="en-US"):
-    """Enhanced audio to text conversion"""
-    temp_files = []
+# Long recordings are split at silences and recognized segment by segment
+CHUNKED_RECOGNITION_SECONDS = 50  # single-request recognition above this length fails or times out
+SEGMENT_MAX_SECONDS = 45
+SEGMENT_MIN_SILENCE_MS = 400
+SEGMENT_PADDING_MS = 200
+VAD_FRAME_MS = 30
+SEGMENT_MAX_WORKERS = 6
+
+_segment_executor = ThreadPoolExecutor(max_workers=SEGMENT_MAX_WORKERS, thread_name_prefix="stt-segment")
+
+# Long text is voiced sentence by sentence with bounded parallelism
+TTS_MAX_WORKERS = 4
+MAX_SENTENCE_CHARS = 500
+
+_tts_executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+_SENTENCE_END = re.compile(r'(?<=[.!?।。！？])\s+')
+
+FAST_PLAYBACK_SPEED = 1.25
+
+# Decoding, filtering and re-encoding run here when the web server installs an
+# AudioWorkerPool (see audio_workers); otherwise they run in the calling thread
+audio_pool = None
+
+def use_audio_pool(pool):
+    global audio_pool
+    audio_pool = pool
+
+def run_cpu(function, *args):
+    """Run a CPU-bound audio step (a module-level function) in the worker pool if there is one"""
+    if audio_pool is None:
+        return function(*args)
+    return audio_pool.run(function, *args)
+
+class PreparedAudio:
+    """Decoded, speech-optimized audio kept in memory for repeated recognition"""
+
+    def __init__(self, segment, source_path=None):
+        self.segment = segment
+        self.source_path = source_path
+        self._audio_data = None
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        return len(self.segment) / 1000.0
+    
+    def excerpt(self, max_seconds):
+        """The first `max_seconds` of audio (self when already short enough)"""
+        if self.duration <= max_seconds:
+            return self
+        return PreparedAudio(self.segment[:int(max_seconds * 1000)], source_path=self.source_path)
     
+    def audio_data(self):
+        """Raw PCM wrapped as sr.AudioData, built once and shared by concurrent recognition attempts"""
+        with self._lock:
+            if self._audio_data is None:
+                # No WAV encode/decode or temp files: the recognizer takes the samples as they are
+                self._audio_data = sr.AudioData(
+                    self.segment.raw_data, self.segment.frame_rate, self.segment.sample_width
+                )
+            return self._audio_data
+
+def _prepare_segment(file_path, pcm=None):
+    """Decoded and filtered AudioSegment for recognition (the CPU-heavy part of prepare_audio)"""
+    if pcm is not None:
+        audio = segment_from_pcm(pcm)
+    else:
+        # ffmpeg decodes straight to 16 kHz mono, skipping any video stream;
+        # the header duration sizes the PCM buffer up front
+        metadata = get_audio_metadata(file_path, allow_decode=False)
+        audio = decode_audio(file_path, expected_seconds=metadata['duration'] if metadata else None)
+    
+    # Optimize for speech recognition (vectorized; pydub's effects loop per sample)
+    audio = normalize(audio)
+    
+    # Only needed when ffmpeg is unavailable and pydub decoded the native format
+    if audio.channels > 1:
+        audio = set_channels(audio, 1)
+    if audio.frame_rate != 16000:
+        audio = set_frame_rate(audio, 16000)
+    
+    # Apply noise reduction
+    audio = high_pass_filter(audio, 80)
+    return audio
+
+def _prepare_pcm(file_path, pcm=None):
+    # Worker-pool entry point: raw samples pickle far cheaper than an AudioSegment
+    audio = _prepare_segment(file_path, pcm)
+    return audio.raw_data, audio.sample_width, audio.frame_rate, audio.channels
+
+def prepare_audio(file_path, pcm=None):
+    """Decode and optimize an audio file for speech recognition, once
+    
+    Pass `pcm` (16 kHz mono s16le, e.g. decoded while the upload streamed in)
+    to skip decoding the file.
+    """
+    if audio_pool is None:
+        audio = _prepare_segment(file_path, pcm)
+    else:
+        data, sample_width, frame_rate, channels = audio_pool.run(_prepare_pcm, file_path, pcm)
+        audio = AudioSegment(data=data, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+    return PreparedAudio(audio, source_path=file_path)
+
+def recognize_speech(audio, src_lang="en-US", with_confidence=False):
+    """Recognize a PreparedAudio in one language; raises sr.UnknownValueError/sr.RequestError
+    
+    With `with_confidence` the result is (transcript, confidence) using the
+    recognizer's own score, falling back to transcript length when it has none.
+    """
+    if not with_confidence:
+        return recognizer.recognize_google(audio.audio_data(), language=src_lang)
+    
+    result = recognizer.recognize_google(audio.audio_data(), language=src_lang, show_all=True)
+    alternatives = result.get('alternative') if isinstance(result, dict) else None
+    if not alternatives:
+        raise sr.UnknownValueError()
+    
+    best = alternatives[0]
+    transcript = best.get('transcript', '')
+    return transcript, best.get('confidence', length_confidence(transcript))
+
+def detect_speech_segments(segment, frame_ms=VAD_FRAME_MS, min_silence_ms=SEGMENT_MIN_SILENCE_MS,
+                           max_segment_ms=SEGMENT_MAX_SECONDS * 1000, padding_ms=SEGMENT_PADDING_MS):
+    """Energy-based voice activity detection on PCM frames
+    
+    Returns (start_ms, end_ms) spans of speech, split at silences and never
+    longer than `max_segment_ms` (over-long speech is cut at its quietest frame).
+    """
+    frame_bytes = int(segment.frame_rate * frame_ms / 1000) * segment.sample_width * segment.channels
+    raw = segment.raw_data
+    max_amplitude = float(1 << (8 * segment.sample_width - 1))
+    
+    levels = []
+    for offset in range(0, len(raw) - frame_bytes + 1, frame_bytes):
+        rms = audioop.rms(raw[offset:offset + frame_bytes], segment.sample_width)
+        levels.append(20 * math.log10(rms / max_amplitude) if rms else -120.0)
+    if not levels:
+        return []
+    
+    # Same rule of thumb as pydub's split_on_silence: 16 dB below average loudness
+    silence_thresh = segment.dBFS - 16
+    min_silence_frames = max(1, min_silence_ms // frame_ms)
+    max_frames = max(1, max_segment_ms // frame_ms)
+    
+    # Collect voiced runs, bridging pauses shorter than min_silence_ms
+    runs = []
+    start = None
+    silent = 0
+    for i, level in enumerate(levels):
+        if level > silence_thresh:
+            if start is None:
+                start = i
+            silent = 0
+        elif start is not None:
+            silent += 1
+            if silent >= min_silence_frames:
+                runs.append((start, i - silent + 1))
+                start = None
+                silent = 0
+    if start is not None:
+        runs.append((start, len(levels) - silent))
+    
+    # Pad runs at their silent edges, then cut over-long runs at the quietest
+    # frame in the second half of each window (cuts are not padded, so no overlap)
+    padding_frames = padding_ms // frame_ms
+    spans = []
+    for start, end in runs:
+        start = max(0, start - padding_frames)
+        end = min(len(levels), end + padding_frames)
+        while end - start > max_frames:
+            window = range(start + max_frames // 2, start + max_frames)
+            cut = min(window, key=lambda i: levels[i])
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, end))
+    
+    total_ms = len(segment)
+    return [(start * frame_ms, min(total_ms, end * frame_ms)) for start, end in spans]
+
+def _recognize_span(segment, src_lang):
+    """Recognize one speech segment straight from its PCM; silence yields ''"""
+    audio_data = sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
     try:
-        wav_file = f"temp_{os.path.basename(file_path)}.wav"
-        temp_files.append(wav_file)
-        
-        file_format = os.path.splitext(file_path)[1][1:].lower()
-        
-        # Enhanced audio preprocessing
-        audio = AudioSegment.from_file(file_path, format=file_format)
-        
-        # Optimize for speech recognition
-        audio = audio.normalize()
-        if audio.channels > 1:
-            audio = audio.set_channels(1)
-        if audio.frame_rate != 16000:
-            audio = audio.set_frame_rate(16000)
-        
-        # Apply noise reduction
-        audio = audio.high_pass_filter(80)
-        
-        # Export optimized audio
-        audio.export(wav_file, format="wav")
+        return recognizer.recognize_google(audio_data, language=src_lang)
+    except sr.UnknownValueError:
+        return ""
+
+def iter_transcript(audio, src_lang="en-US"):
+    """Yield recognized segments in order as soon as each one is ready
+    
+    Each segment is {'start', 'end', 'text', 'index', 'count'} with times in
+    seconds. At most SEGMENT_MAX_WORKERS segments are in flight, so later
+    stages can start on the first segment while the rest are still being
+    recognized. Silent segments are skipped; sr.RequestError propagates.
+    """
+    if audio.duration <= CHUNKED_RECOGNITION_SECONDS:
+        try:
+            text = recognize_speech(audio, src_lang)
+        except sr.UnknownValueError:
+            return
+        yield {'start': 0.0, 'end': audio.duration, 'text': text, 'index': 0, 'count': 1}
+        return
+    
+    spans = detect_speech_segments(audio.segment)
+    logger.info(f"Recognizing {len(spans)} segments of {audio.duration:.0f}s audio")
+    
+    def finished(entry):
+        index, start, end, future = entry
+        text = future.result().strip()
+        if text:
+            yield {'start': start / 1000.0, 'end': end / 1000.0, 'text': text, 'index': index, 'count': len(spans)}
+    
+    in_flight = deque()
+    for index, (start, end) in enumerate(spans):
+        future = _segment_executor.submit(_recognize_span, audio.segment[start:end], src_lang)
+        in_flight.append((index, start, end, future))
+        if len(in_flight) >= SEGMENT_MAX_WORKERS:
+            yield from finished(in_flight.popleft())
+    while in_flight:
+        yield from finished(in_flight.popleft())
+
+def transcribe(audio, src_lang="en-US"):
+    """Speech to text with timestamps: returns (text, segments)
+    
+    Short audio is sent in one request. Longer audio is split at silences,
+    the segments are recognized concurrently and stitched back in order, so
+    latency follows the longest segment rather than the whole file. Each
+    segment is {'start', 'end', 'text'} with times in seconds. On failure the
+    text is an error message, as with audio_to_text.
+    """
+    try:
+        if not isinstance(audio, PreparedAudio):
+            audio = prepare_audio(audio)
         
         # Speech recognition
-        with sr.AudioFile(wav_file) as source:
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            audio_data = recognizer.record(source)
+        try:
+            segments = [
+                {'start': segment['start'], 'end': segment['end'], 'text': segment['text']}
+                for segment in iter_transcript(audio, src_lang)
+            ]
+            if not segments:
+                raise sr.UnknownValueError()
+            return ' '.join(segment['text'] for segment in segments), segments
             
-            try:
-                text = recognizer.recognize_google(audio_data, language=src_lang)
-                return text
-            except sr.UnknownValueError:
-                return f"Could not understand audio in {src_lang}"
-            except sr.RequestError as e:
-                return f"Speech recognition service error: {e}"
+        except sr.UnknownValueError:
+            return f"Could not understand audio in {src_lang}", []
+        except sr.RequestError as e:
+            return f"Speech recognition service error: {e}", []
                 
     except Exception as e:
         logger.error(f"Audio to text conversion failed: {e}")
-        return f"Error processing audio: {str(e)}"
+        return f"Error processing audio: {str(e)}", []
+
+def audio_to_text(audio, src_lang="en-US"):
+    """Enhanced audio to text conversion
+    
+    `audio` is either a file path or a PreparedAudio from prepare_audio(),
+    so callers trying several languages only decode the file once.
+    """
+    text, _ = transcribe(audio, src_lang)
+    return text
+
+_translators = threading.local()
+
+def get_translator(src_lang, target_lang):
+    """Reuse one GoogleTranslator per language pair and thread (instances are not thread-safe)"""
+    cache = getattr(_translators, 'by_pair', None)
+    if cache is None:
+        cache = _translators.by_pair = {}
+    translator = cache.get((src_lang, target_lang))
+    if translator is None:
+        translator = cache[(src_lang, target_lang)] = GoogleTranslator(source=src_lang, target=target_lang)
+    return translator
+
+def _translate_chunk(chunk, src_lang, target_lang):
+    """Translate one chunk, answering repeats from the translation cache"""
+    cached = translation_cache.get(chunk, src_lang, target_lang)
+    if cached is not None:
+        return cached
     
-    finally:
-        # Cleanup temporary files
-        for temp_file in temp_files:
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
+    translated = get_translator(src_lang, target_lang).translate(chunk)
+    if translated:
+        translation_cache.put(chunk, src_lang, target_lang, translated)
+    return translated
 
 def translate_text(text, src_lang="en", target_lang="hi"):
     """Enhanced text translation"""
@@ -89,38 +338,77 @@ def translate_text(text, src_lang="en", target_lang="hi"):
             translated_chunks = []
             
             for chunk in chunks:
-                translator = GoogleTranslator(source=src_lang, target=target_lang)
-                translated_chunk = translator.translate(chunk)
+                translated_chunk = _translate_chunk(chunk, src_lang, target_lang)
                 translated_chunks.append(translated_chunk)
             
             return ' '.join(translated_chunks)
         else:
-            translator = GoogleTranslator(source=src_lang, target=target_lang)
-            translated = translator.translate(text)
+            translated = _translate_chunk(text, src_lang, target_lang)
             return translated
             
     except Exception as e:
         logger.error(f"Translation failed: {e}")
         return f"Translation error: {str(e)}"
 
+def split_sentences(text, max_chars=MAX_SENTENCE_CHARS):
+    """Split text at sentence ends, merging fragments and wrapping over-long sentences"""
+    sentences = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentences and len(sentences[-1]) + len(sentence) < 40:
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        elif sentence:
+            sentences.append(sentence)
+    return sentences
+
+def iter_synthesized(sentences, lang="hi", voice_type="standard", skip_errors=False):
+    """Synthesize sentences concurrently and yield their MP3 bytes in order
+    
+    At most TTS_MAX_WORKERS sentences are in flight. With `skip_errors` a
+    failed sentence is logged and yields b'' instead of raising, so callers
+    can tell the voice is incomplete.
+    """
+    def finished(future):
+        try:
+            yield future.result()
+        except Exception as e:
+            if not skip_errors:
+                raise
+            logger.warning(f"TTS failed for a sentence: {e}")
+            yield b''
+    
+    in_flight = deque()
+    for sentence in sentences:
+        in_flight.append(_tts_executor.submit(synthesize_speech, sentence, lang, voice_type))
+        if len(in_flight) >= TTS_MAX_WORKERS:
+            yield from finished(in_flight.popleft())
+    while in_flight:
+        yield from finished(in_flight.popleft())
+
 def text_to_speech(text, lang="hi", out_file="output.mp3", voice_type="standard"):
-    """Enhanced text to speech with voice options"""
+    """Enhanced text to speech with voice options
+    
+    Text of any length is split on sentence boundaries and the sentences are
+    synthesized concurrently; their MP3 frames are joined in order as-is.
+    """
     try:
         if not text or text.strip() == "":
             raise ValueError("No text provided for TTS")
         
-        # Handle text length limitations
-        if len(text) > 1000:
-            text = text[:1000] + "..."
-        
-        # Configure TTS based on voice type
-        slow_speech = voice_type == "slow"
-        
-        # Create TTS object
-        tts = gTTS(text=text, lang=lang, slow=slow_speech)
+        # Configure TTS based on voice type; speed-up is applied once to the whole file below
+        tts_voice = "slow" if voice_type == "slow" else "standard"
         
         # Save to file
-        tts.save(out_file)
+        with open(out_file, 'wb') as output:
+            for fragment in iter_synthesized(split_sentences(text), lang=lang, voice_type=tts_voice):
+                output.write(fragment)
         
         if os.path.exists(out_file):
             file_size = os.path.getsize(out_file)
@@ -130,9 +418,10 @@ def text_to_speech(text, lang="hi", out_file="output.mp3", voice_type="standard"
                 # Post-process audio based on voice type
                 if voice_type == "fast":
                     try:
-                        audio = AudioSegment.from_file(out_file)
-                        faster_audio = audio.speedup(playback_speed=1.25)
-                        faster_audio.export(out_file, format="mp3")
+                        with open(out_file, 'rb') as f:
+                            faster_audio = run_cpu(speed_up_mp3, f.read())
+                        with open(out_file, 'wb') as f:
+                            f.write(faster_audio)
                         logger.info("Applied fast speech processing")
                     except Exception as e:
                         logger.warning(f"Could not apply fast speech: {e}")
@@ -147,46 +436,100 @@ def text_to_speech(text, lang="hi", out_file="output.mp3", voice_type="standard"
         logger.error(f"Text to speech conversion failed: {e}")
         raise e
 
-def detect_language_from_audio(file_path, max_attempts=5):
-    """Advanced language detection from audio"""
-    common_languages = ['en-US', 'es-ES', 'fr-FR', 'de-DE', 'it-IT', 'pt-PT', 
-                       'ru-RU', 'ja-JP', 'ko-KR', 'zh-CN', 'ar-SA', 'hi-IN']
+def speed_up_mp3(mp3_bytes, playback_speed=FAST_PLAYBACK_SPEED):
+    """Re-encode MP3 bytes played faster (decode, time-compress, encode: CPU-bound)"""
+    faster_audio = AudioSegment.from_file(io.BytesIO(mp3_bytes), format="mp3").speedup(playback_speed=playback_speed)
+    buffer = io.BytesIO()
+    faster_audio.export(buffer, format="mp3")
+    return buffer.getvalue()
+
+def synthesize_speech(text, lang="hi", voice_type="standard"):
+    """Synthesize one piece of text and return the MP3 bytes
+    
+    Results are kept in the content-addressed TTS store, so a phrase that was
+    voiced before in the same language and voice costs no synthesis.
+    """
+    blob_hash = tts_store.key_for(text, lang, voice_type)
+    cached = tts_store.get_bytes(blob_hash)
+    if cached:
+        return cached
     
-    best_result = None
-    best_confidence = 0.0
-    detected_lang = 'en'
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang, slow=voice_type == "slow").write_to_fp(buffer)
+    mp3_bytes = buffer.getvalue()
+    if not mp3_bytes:
+        raise ValueError("TTS returned no audio")
     
-    for lang in common_languages[:max_attempts]:
+    if voice_type == "fast":
         try:
-            text_result = audio_to_text(file_path, src_lang=lang)
-            if text_result and not text_result.startswith('Could not') and len(text_result.strip()) > 5:
-                confidence = min(len(text_result.strip()) / 50.0, 1.0)
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    best_result = text_result
-                    detected_lang = lang.split('-')[0]
-                    
-                if confidence > 0.7:
-                    break
-                    
+            mp3_bytes = run_cpu(speed_up_mp3, mp3_bytes)
         except Exception as e:
-            logger.debug(f"Language detection failed for {lang}: {e}")
-            continue
+            logger.warning(f"Could not apply fast speech: {e}")
+    
+    tts_store.put_bytes(blob_hash, mp3_bytes, lang=lang, voice_type=voice_type)
+    return mp3_bytes
+
+def get_speech_recognition_lang_code(lang_code):
+    """Map language codes to Speech Recognition compatible codes"""
+    sr_mapping = {
+        'en': 'en-US', 'es': 'es-ES', 'fr': 'fr-FR', 'de': 'de-DE', 'it': 'it-IT',
+        'pt': 'pt-PT', 'pt-br': 'pt-BR', 'ru': 'ru-RU', 'ja': 'ja-JP', 'ko': 'ko-KR',
+        'zh': 'zh-CN', 'zh-cn': 'zh-CN', 'zh-tw': 'zh-TW', 'ar': 'ar-SA',
+        'nl': 'nl-NL', 'sv': 'sv-SE', 'no': 'nb-NO', 'da': 'da-DK', 'fi': 'fi-FI',
+        'pl': 'pl-PL', 'cs': 'cs-CZ', 'sk': 'sk-SK', 'hu': 'hu-HU', 'ro': 'ro-RO',
+        'bg': 'bg-BG', 'hr': 'hr-HR', 'sl': 'sl-SI', 'et': 'et-EE', 'lv': 'lv-LV',
+        'lt': 'lt-LT', 'el': 'el-GR', 'tr': 'tr-TR', 'uk': 'uk-UA',
+        'hi': 'hi-IN', 'bn': 'bn-IN', 'te': 'te-IN', 'mr': 'mr-IN', 'ta': 'ta-IN',
+        'gu': 'gu-IN', 'kn': 'kn-IN', 'ml': 'ml-IN', 'pa': 'pa-IN', 'ur': 'ur-PK',
+        'th': 'th-TH', 'vi': 'vi-VN', 'id': 'id-ID', 'ms': 'ms-MY', 'tl': 'tl-PH',
+        'my': 'my-MM', 'km': 'km-KH', 'he': 'he-IL', 'fa': 'fa-IR', 'af': 'af-ZA',
+        'sw': 'sw-KE', 'is': 'is-IS', 'ca': 'ca-ES', 'eu': 'eu-ES'
+    }
+    return sr_mapping.get(lang_code, f'{lang_code}-US')
+
+def get_language_code_for_tts(lang_code):
+    """Map language codes to TTS-compatible codes"""
+    tts_mapping = {
+        'zh': 'zh-cn', 'zh-cn': 'zh-cn', 'zh-tw': 'zh-tw', 'pt': 'pt', 'pt-br': 'pt-br'
+    }
+    return tts_mapping.get(lang_code, lang_code)
+
+def detect_language_from_audio(file_path, max_attempts=5):
+    """Advanced language detection from audio"""
+    common_languages = {
+        'en': 'en-US', 'es': 'es-ES', 'fr': 'fr-FR', 'de': 'de-DE', 'it': 'it-IT', 'pt': 'pt-PT',
+        'ru': 'ru-RU', 'ja': 'ja-JP', 'ko': 'ko-KR', 'zh-cn': 'zh-CN', 'ar': 'ar-SA', 'hi': 'hi-IN'
+    }
+    
+    try:
+        prepared_audio = file_path if isinstance(file_path, PreparedAudio) else prepare_audio(file_path)
+    except Exception as e:
+        logger.error(f"Language detection could not decode audio: {e}")
+        return 'en'
     
-    return detected_lang
+    # The opening seconds are enough to identify the language of long recordings
+    prepared_audio = prepared_audio.excerpt(CHUNKED_RECOGNITION_SECONDS)
+    
+    # Cheap acoustic pre-filter picks which languages are worth a recognizer call
+    ranked = rank_languages(prepared_audio, list(common_languages))
+    candidates = [lang for lang, _ in ranked][:max_attempts]
+    
+    # Remaining candidates are recognized concurrently; the first confident match wins
+    best_lang, _, _ = detect_language_parallel(
+        lambda lang: recognize_speech(prepared_audio, common_languages[lang], with_confidence=True),
+        candidates,
+        threshold=0.7
+    )
+    
+    return best_lang.split('-')[0] if best_lang else 'en'
 
 def get_audio_info(file_path):
     """Get comprehensive audio file information"""
     try:
-        audio = AudioSegment.from_file(file_path)
-        return {
-            'duration': len(audio) / 1000.0,
-            'channels': audio.channels,
-            'frame_rate': audio.frame_rate,
-            'sample_width': audio.sample_width,
-            'format': os.path.splitext(file_path)[1][1:].upper(),
-            'file_size': os.path.getsize(file_path)
-        }
+        metadata = get_audio_metadata(file_path)
+        if metadata is None:
+            raise ValueError("unreadable audio file")
+        return metadata
     except Exception as e:
         logger.error(f"Error getting audio info: {e}")
         return None
@@ -200,11 +543,11 @@ def enhance_audio_quality(file_path, output_path=None):
         audio = AudioSegment.from_file(file_path)
         
         # Audio enhancements
-        audio = audio.normalize()  # Normalize volume
-        audio = audio.set_channels(1)  # Convert to mono for consistency
+        audio = normalize(audio)  # Normalize volume
+        audio = set_channels(audio, 1)  # Convert to mono for consistency
         
         # Apply gentle compression for better voice clarity
-        audio = audio.compress_dynamic_range(threshold=-20.0, ratio=4.0, attack=5.0, release=50.0)
+        audio = compress_dynamic_range(audio, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0)
         
         # Export enhanced audio
         audio.export(output_path, format="mp3", bitrate="192k")
@@ -224,12 +567,15 @@ if __name__ == "__main__":
     if audio_info:
         print(f"📊 Audio Info: {audio_info}")
     
+    # Decode once for detection and transcription
+    prepared_audio = prepare_audio(input_file)
+    
     # Auto-detect language
     detect_lang = input("Auto-detect language? (y/n): ").lower() == 'y'
     
     if detect_lang:
         print("🔍 Detecting language...")
-        source_lang = detect_language_from_audio(input_file)
+        source_lang = detect_language_from_audio(prepared_audio)
         print(f"🌍 Detected language: {source_lang}")
     else:
         source_lang = input("Enter source language code: ")
@@ -240,7 +586,7 @@ if __name__ == "__main__":
     # Process with voice generation
     print("🎤 Converting speech to text...")
     sr_lang = f"{source_lang}-US" if '-' not in source_lang else source_lang
-    text = audio_to_text(input_file, src_lang=sr_lang)
+    text = audio_to_text(prepared_audio, src_lang=sr_lang)
     print("📝 Text:", text)
 
     if source_lang != target_lang and not text.startswith('Could not'):
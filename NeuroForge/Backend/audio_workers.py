@@ -0,0 +1,150 @@
+"""
+Process pool for CPU-bound audio work
+Decoding, filtering and re-encoding run in warm worker processes so pipeline threads don't contend for the GIL
+"""
+
+import os
+import threading
+import multiprocessing
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+AUDIO_WORKERS = int(os.environ.get('AUDIO_WORKERS', os.cpu_count() or 1))
+AUDIO_QUEUE_SIZE = int(os.environ.get('AUDIO_QUEUE_SIZE', AUDIO_WORKERS * 2))  # tasks waiting for a worker
+
+class AudioPoolBusy(Exception):
+    """Every worker is busy and the pool's queue is full"""
+
+def _init_worker():
+    # Load the audio stack before the first task, and make sure audio steps run
+    # inline here instead of re-submitting to the pool
+    import audio_processing
+    audio_processing.use_audio_pool(None)
+
+def _context():
+    """forkserver where available, else spawn
+
+    Workers never fork the server process itself, whose database, job and
+    recorder threads (and their locks) do not survive a fork.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['audio_processing'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _ping():
+    return os.getpid()
+
+class AudioWorkerPool:
+    """A fixed set of worker processes with a bounded number of queued tasks
+
+    Creating the pool starts nothing; start() launches the workers, so the
+    serving process calls it on first use rather than at import. run() waits
+    for a free slot (pipeline threads have already been admitted);
+    run(block=False) raises AudioPoolBusy instead. saturated() lets request
+    handlers turn new work away before it is accepted.
+    """
+
+    def __init__(self, workers=AUDIO_WORKERS, queue_size=AUDIO_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._executor = None
+        self._started = None  # None until start(), then whether the workers are running
+        self._in_flight = 0
+        self._waiting = 0
+        self.counters = {'tasks': 0, 'rejected': 0, 'restarts': 0}
+
+    def start(self):
+        """Launch and warm up the workers once; returns whether the pool is usable
+
+        Later calls return at once. Returns False (callers then run the work
+        inline) if worker processes cannot be started.
+        """
+        if self._started is not None:
+            return self._started
+        with self._start_lock:
+            if self._started is None:
+                self._started = self._launch()
+        return self._started
+
+    def _launch(self):
+        executor = None
+        try:
+            executor = self._new_executor()
+            # Launches every worker and waits until each has run its initializer
+            for future in [executor.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+        except Exception as e:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+            logger.warning(f"⚠️ Audio worker pool unavailable ({e}); CPU-heavy audio steps run in-process")
+            return False
+        with self._lock:
+            self._executor = executor
+        logger.info(f"⚙️ Audio worker pool ready: {self.workers} processes, {self.capacity - self.workers} queued")
+        return True
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=_context(), initializer=_init_worker)
+
+    def run(self, function, *args, block=True):
+        """Call `function(*args)` in a worker process and return its result"""
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(blocking=block)
+        with self._lock:
+            self._waiting -= 1
+            if acquired:
+                self._in_flight += 1
+                self.counters['tasks'] += 1
+            else:
+                self.counters['rejected'] += 1
+        if not acquired:
+            raise AudioPoolBusy(f"{self.capacity} audio tasks already running or queued")
+
+        executor = self._executor
+        try:
+            return executor.submit(function, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool for later tasks
+            self._restart(executor)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _restart(self, broken):
+        with self._lock:
+            # Every task on the broken executor fails at once; only the first replaces it
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+            self.counters['restarts'] += 1
+        logger.error("❌ Audio worker process died; worker pool restarted")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def saturated(self):
+        """True when a new task could not start or queue without waiting"""
+        with self._lock:
+            return self._in_flight + self._waiting >= self.capacity
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update(workers=self.workers, capacity=self.capacity,
+                         in_flight=self._in_flight, waiting=self._waiting)
+        return stats
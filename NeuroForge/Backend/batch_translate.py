@@ -0,0 +1,301 @@
+"""
+Bulk offline translation
+Translates every media file under a directory or listed in a manifest on a process pool, writing
+one MP3 per file and language plus a JSONL log, and checkpoints each result in neuroforge.db so
+an interrupted run resumes where it stopped
+
+Usage: python batch_translate.py INPUT [INPUT ...] -t hi,mr [-s auto] [-v standard] [-o batch_output] [-j N]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from db_pool import connect
+from schema import migrate_database
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = 'neuroforge.db'
+OUTPUT_FOLDER = 'batch_output'
+MEDIA_EXTENSIONS = {'mp3', 'wav', 'mp4', 'avi', 'mov', 'm4a', 'ogg', 'webm', 'flac'}  # same as /upload
+TASKS_PER_WORKER = 2  # files queued ahead per worker so none sits idle between results
+
+def iter_media_files(inputs):
+    """Absolute paths of the media files in `inputs`, in a stable order
+
+    Directories are walked recursively. Any other file that is not media is a
+    manifest: one path per line (relative to the manifest), '#' starts a comment.
+    """
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = []
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files))
+        elif item.rsplit('.', 1)[-1].lower() in MEDIA_EXTENSIONS:
+            paths = [item]
+        else:
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item, encoding='utf-8') as manifest:
+                paths = [
+                    os.path.join(base, line.strip()) for line in manifest
+                    if line.strip() and not line.lstrip().startswith('#')
+                ]
+
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in seen or path.rsplit('.', 1)[-1].lower() not in MEDIA_EXTENSIONS:
+                continue
+            seen.add(path)
+            if os.path.isfile(path):
+                yield path
+            else:
+                logger.warning(f"⚠️ Skipping missing file: {path}")
+
+class Checkpoint:
+    """Per (file, language, voice) results in SQLite; a changed file is processed again
+
+    The batch_progress table comes from schema.SCHEMA_MIGRATIONS, so migrate the database first.
+    """
+
+    def __init__(self, database_path=DATABASE_PATH):
+        self.connection = connect(database_path)
+
+    def pending_targets(self, path, file_size, file_mtime, targets, voice_type):
+        done = {row[0] for row in self.connection.execute(
+            "SELECT target_language FROM batch_progress "
+            "WHERE file_path = ? AND voice_type = ? AND file_size = ? AND file_mtime = ? AND status = 'done'",
+            (path, voice_type, file_size, file_mtime)
+        )}
+        return [target for target in targets if target not in done]
+
+    def record(self, task, outputs):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO batch_progress "
+            "(file_path, target_language, voice_type, file_size, file_mtime, status, output_path, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (task['path'], output['target_language'], task['voice_type'], task['file_size'],
+                 task['file_mtime'], output['status'], output['output_audio'], output['error'], time.time())
+                for output in outputs
+            ]
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+def output_path_for(task, target_language):
+    """MP3 name from the file's path relative to its input, so equal basenames never collide"""
+    stem = os.path.splitext(task['relative_path'])[0].replace(os.sep, '__')
+    return os.path.join(task['output_dir'], f"{stem}.{target_language}.mp3")
+
+def init_worker(database_path=DATABASE_PATH):
+    """Load the processing stack once per worker process, not once per file"""
+    logging.getLogger().setLevel(logging.WARNING)
+    import audio_processing
+    import streaming_pipeline
+    from translation_cache import translation_cache
+    from tts_store import tts_store, store_folder_for
+
+    # Both open their connections lazily, so pointing them elsewhere here is enough;
+    # the blobs live beside the database so its index never names files in another tree
+    translation_cache.database_path = database_path
+    tts_store.database_path = database_path
+    tts_store.root = store_folder_for(database_path)
+
+def process_file(task):
+    """Recognize one file once and translate and voice it into each pending language
+
+    Runs in a worker process. Returns one output dict per language; an
+    exception before recognition finishes fails every language of the file.
+    """
+    from audio_processing import (prepare_audio, detect_language_from_audio, iter_transcript,
+                                  get_speech_recognition_lang_code, get_language_code_for_tts)
+    from audio_metadata import get_audio_metadata
+    from streaming_pipeline import stream_translation
+
+    start_time = time.time()
+    try:
+        prepared_audio = prepare_audio(task['path'])
+        source_language = task['source_language']
+        if source_language == 'auto':
+            source_language = detect_language_from_audio(prepared_audio)
+
+        sr_lang = get_speech_recognition_lang_code(source_language)
+        transcript = list(iter_transcript(prepared_audio, sr_lang))
+    except Exception as e:
+        return [
+            {'target_language': target, 'status': 'failed', 'error': str(e), 'output_audio': None}
+            for target in task['targets']
+        ]
+
+    segments = [{'start': s['start'], 'end': s['end'], 'text': s['text']} for s in transcript]
+    common = {
+        'detected_source_language': source_language,
+        'original_text': ' '.join(segment['text'] for segment in segments),
+        'segments': segments
+    }
+    if not segments:
+        # Nothing to translate is a final answer, not a failure to retry
+        return [
+            dict(common, target_language=target, status='done', error=f"Could not understand audio in {sr_lang}",
+                 translated_text='', output_audio=None, audio_duration=0.0,
+                 processing_time=time.time() - start_time)
+            for target in task['targets']
+        ]
+
+    outputs = []
+    for target in task['targets']:
+        out_file = output_path_for(task, target)
+        try:
+            _, _, translated_text, audio_written, voice_complete = stream_translation(
+                prepared_audio,
+                sr_lang=sr_lang,
+                src_lang=source_language,
+                target_lang=target,
+                tts_lang=get_language_code_for_tts(target),
+                voice_type=task['voice_type'],
+                out_file=out_file,
+                transcript=transcript
+            )
+            if not audio_written:
+                os.remove(out_file)
+                raise RuntimeError("no voice was generated")
+            metadata = get_audio_metadata(out_file)
+            # Voice with skipped sentences is kept but not checkpointed as done, so the next run redoes it
+            outputs.append(dict(
+                common, target_language=target, status='done' if voice_complete else 'failed',
+                error=None if voice_complete else "some sentences could not be translated or voiced",
+                translated_text=translated_text,
+                output_audio=out_file, audio_duration=metadata['duration'] if metadata else 0.0,
+                processing_time=time.time() - start_time
+            ))
+        except Exception as e:
+            outputs.append(dict(common, target_language=target, status='failed', error=str(e), output_audio=None))
+    return outputs
+
+def collect_tasks(args, checkpoint):
+    """Tasks for files with languages still to do; returns (tasks, files_skipped)"""
+    tasks = []
+    skipped = 0
+    for path in iter_media_files(args.inputs):
+        stat = os.stat(path)
+        targets = checkpoint.pending_targets(path, stat.st_size, stat.st_mtime_ns, args.targets, args.voice_type)
+        if not targets:
+            skipped += 1
+            continue
+        root = next((os.path.abspath(item) for item in args.inputs
+                     if os.path.isdir(item) and path.startswith(os.path.abspath(item) + os.sep)), None)
+        tasks.append({
+            'path': path,
+            'relative_path': os.path.relpath(path, root) if root else os.path.basename(path),
+            'file_size': stat.st_size,
+            'file_mtime': stat.st_mtime_ns,
+            'targets': targets,
+            'source_language': args.source_language,
+            'voice_type': args.voice_type,
+            'output_dir': args.output
+        })
+    return tasks, skipped
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+def run_batch(args):
+    """Process every pending file; returns the number of failed (file, language) results"""
+    os.makedirs(args.output, exist_ok=True)
+    # The checkpoint, translation cache and voice store all live in --database, migrated like the app's
+    migrate_database(args.database)
+    checkpoint = Checkpoint(args.database)
+    tasks, skipped = collect_tasks(args, checkpoint)
+    print(f"📂 {len(tasks)} files to process, {skipped} already done, {args.workers} workers")
+    if not tasks:
+        checkpoint.close()
+        return 0
+
+    failed = 0
+    done = 0
+    start_time = time.time()
+    log_path = os.path.join(args.output, 'results.jsonl')
+    remaining = iter(tasks)
+    in_flight = {}
+
+    with open(log_path, 'a', encoding='utf-8') as log, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                initargs=(args.database,)) as executor:
+        try:
+            while True:
+                # Keep a bounded number of files queued; thousands of futures are never created at once
+                for task in remaining:
+                    in_flight[executor.submit(process_file, task)] = task
+                    if len(in_flight) >= args.workers * TASKS_PER_WORKER:
+                        break
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = in_flight.pop(future)
+                    try:
+                        outputs = future.result()
+                    except Exception as e:
+                        # A crashed worker process fails the file; the next run retries it
+                        outputs = [
+                            {'target_language': target, 'status': 'failed', 'error': str(e), 'output_audio': None}
+                            for target in task['targets']
+                        ]
+
+                    checkpoint.record(task, outputs)
+                    for output in outputs:
+                        log.write(json.dumps(dict(output, file=task['path'], voice_type=task['voice_type']),
+                                             ensure_ascii=False) + '\n')
+                    log.flush()
+
+                    done += 1
+                    file_failures = sum(1 for output in outputs if output['status'] != 'done')
+                    failed += file_failures
+                    elapsed = time.time() - start_time
+                    eta = elapsed / done * (len(tasks) - done)
+                    print(f"[{done}/{len(tasks)}] {'❌' if file_failures else '✅'} {task['relative_path']} "
+                          f"({format_seconds(elapsed)} elapsed, ETA {format_seconds(eta)})")
+        except KeyboardInterrupt:
+            print("⏹️ Interrupted; finished files are checkpointed and will be skipped next run")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            checkpoint.close()
+
+    print(f"🏁 {done} files in {format_seconds(time.time() - start_time)}, {failed} failed translations; "
+          f"results in {log_path}")
+    return failed
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Translate directories of audio and video files offline")
+    parser.add_argument('inputs', nargs='+', help="directories, media files or manifests (one path per line)")
+    parser.add_argument('-t', '--targets', required=True,
+                        type=lambda value: [lang.strip() for lang in value.split(',') if lang.strip()],
+                        help="comma-separated target language codes, e.g. hi,mr,ta")
+    parser.add_argument('-s', '--source-language', default='auto', help="source language code (default: auto)")
+    parser.add_argument('-v', '--voice-type', default='standard', choices=['standard', 'slow', 'fast'])
+    parser.add_argument('-o', '--output', default=OUTPUT_FOLDER, help=f"output folder (default: {OUTPUT_FOLDER})")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--database', default=DATABASE_PATH,
+                        help=f"SQLite database for the checkpoint, translation cache and voice store index; "
+                             f"voice blobs go to output_audio/store beside it (default: {DATABASE_PATH})")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        sys.exit(1 if run_batch(parse_args(sys.argv[1:])) else 0)
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -0,0 +1,136 @@
+"""
+SQLite connection pooling
+Connections are opened once with WAL journaling and tuned pragmas, then reused across requests and workers
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 16))
+DB_POOL_TIMEOUT = 30                                                  # seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 10000))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16 * 1024))  # page cache per connection
+DB_STATEMENT_CACHE_SIZE = 256                                         # prepared statements kept per connection
+
+def connect(database_path, check_same_thread=True):
+    """Open a SQLite connection with WAL and the tuned pragmas
+
+    WAL lets readers run alongside a writer, so history and audio lookups
+    never wait for an upload's commit.
+    """
+    connection = sqlite3.connect(
+        database_path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+        check_same_thread=check_same_thread,
+        cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")  # durable across app crashes; fsync only at checkpoints
+    connection.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    connection.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    connection.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    return connection
+
+class PooledConnection:
+    """A pooled sqlite3 connection; close() hands it back instead of closing it"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self._connection.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool._release(connection)
+
+    def __del__(self):
+        # Routes that fail before close() still return their connection
+        try:
+            self.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """Thread-safe pool of at most `size` connections to one database
+
+    The most recently returned connection is handed out first, so a busy
+    worker keeps reusing the same warm connection and its statement cache.
+    """
+
+    def __init__(self, database_path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, row_factory=sqlite3.Row):
+        self.database_path = database_path
+        self.size = size
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """A PooledConnection; call close() to return it"""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = None
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    opening = True
+                else:
+                    opening = False
+            if opening:
+                try:
+                    connection = connect(self.database_path, check_same_thread=False)
+                    connection.row_factory = self.row_factory
+                except sqlite3.Error:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(f"No database connection free after {self.timeout}s")
+        return PooledConnection(self, connection)
+
+    def _release(self, connection):
+        # Never hand out a connection with a half-finished transaction
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            with self._lock:
+                self._opened -= 1
+            connection.close()
+            return
+        self._idle.put(connection)
+
+    def close_all(self):
+        """Close idle connections (e.g. at shutdown)"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                self._opened -= 1
+            connection.close()
@@ -0,0 +1,303 @@
+"""
+Vectorized audio DSP for the speech pipeline
+NumPy replacements for pydub's normalize, high_pass_filter and compress_dynamic_range,
+plus downmix and resample, working on int16/float32 sample arrays
+
+The AudioSegment wrappers at the bottom take the same arguments as the pydub
+effects they replace and fall back to pydub when NumPy is not installed.
+Compare both chains with:
+
+    python dsp.py benchmark [minutes ...]
+"""
+
+import sys
+import math
+import time
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+FFT_BLOCK_SIZE = 1 << 16     # samples per overlap-add block; bounds filter memory on long media
+IMPULSE_TOLERANCE = 1e-6     # IIR responses are truncated once they decay below this
+MAX_IMPULSE_LENGTH = 1 << 15
+RESAMPLE_TAPS = 255          # anti-aliasing FIR length used when downsampling
+COMPRESSOR_HOP_MS = 1.0      # gain is computed per hop and interpolated between hops
+
+def to_float(samples):
+    """float32 samples in [-1, 1] from an int or float array"""
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        return samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    return samples.astype(np.float32, copy=False)
+
+def from_float(samples, dtype):
+    """Convert float samples back to `dtype`, clipping integer output to its range"""
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        scaled = np.rint(samples * float(info.max + 1))
+        return np.clip(scaled, info.min, info.max).astype(dtype)
+    return samples.astype(dtype, copy=False)
+
+def _db_to_gain(db):
+    return 10.0 ** (db / 20.0)
+
+def fft_filter(samples, impulse, block_size=FFT_BLOCK_SIZE):
+    """Convolve float samples with an FIR impulse response by block overlap-add"""
+    samples = to_float(samples)
+    impulse = np.asarray(impulse, dtype=np.float64)
+    if len(samples) == 0:
+        return samples
+
+    tail = len(impulse) - 1
+    n_fft = 1 << (block_size + tail - 1).bit_length()
+    response = np.fft.rfft(impulse, n_fft)
+    output = np.zeros(len(samples) + tail, dtype=np.float32)
+
+    for start in range(0, len(samples), block_size):
+        block = samples[start:start + block_size]
+        filtered = np.fft.irfft(np.fft.rfft(block, n_fft) * response, n_fft)[:len(block) + tail]
+        output[start:start + len(filtered)] += filtered
+
+    return output[:len(samples)]
+
+def biquad_impulse_response(b, a, tolerance=IMPULSE_TOLERANCE, max_length=MAX_IMPULSE_LENGTH):
+    """Impulse response of a stable biquad, long enough to decay below `tolerance`"""
+    b0, b1, b2 = (coefficient / a[0] for coefficient in b)
+    a1, a2 = a[1] / a[0], a[2] / a[0]
+
+    # Pole radius is sqrt(a2) for complex poles; use the larger real pole otherwise
+    discriminant = a1 * a1 - 4 * a2
+    radius = math.sqrt(a2) if discriminant < 0 else max(abs((-a1 + s * math.sqrt(discriminant)) / 2) for s in (1, -1))
+    length = max_length if radius >= 1 else min(max_length, int(math.log(tolerance) / math.log(max(radius, 1e-9))) + 3)
+
+    impulse = [0.0] * length
+    x1 = x2 = y1 = y2 = 0.0
+    for n in range(length):
+        x0 = 1.0 if n == 0 else 0.0
+        y0 = b0 * x0 + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+        impulse[n] = y0
+        x2, x1, y2, y1 = x1, x0, y1, y0
+    return np.array(impulse)
+
+def high_pass(samples, sample_rate, cutoff, q=1 / math.sqrt(2)):
+    """Second-order (biquad) Butterworth high-pass; returns the input dtype"""
+    w0 = 2 * math.pi * cutoff / sample_rate
+    alpha = math.sin(w0) / (2 * q)
+    cos_w0 = math.cos(w0)
+    b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+
+    filtered = fft_filter(samples, biquad_impulse_response(b, a))
+    return from_float(filtered, np.asarray(samples).dtype)
+
+def normalize_peak(samples, headroom=0.1):
+    """Scale so the peak sits `headroom` dB below full scale"""
+    values = to_float(samples)
+    peak = float(np.max(np.abs(values))) if len(values) else 0.0
+    if peak == 0:
+        return np.asarray(samples)
+    return from_float(values * (_db_to_gain(-headroom) / peak), np.asarray(samples).dtype)
+
+def normalize_rms(samples, target_dbfs=-20.0, headroom=0.1):
+    """Scale to a target RMS level, limited so the peak keeps `headroom` dB"""
+    values = to_float(samples)
+    if not len(values):
+        return np.asarray(samples)
+    rms = float(np.sqrt(np.mean(np.square(values, dtype=np.float64))))
+    peak = float(np.max(np.abs(values)))
+    if rms == 0:
+        return np.asarray(samples)
+    gain = min(_db_to_gain(target_dbfs) / rms, _db_to_gain(-headroom) / peak)
+    return from_float(values * gain, np.asarray(samples).dtype)
+
+def compress(samples, sample_rate, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0,
+             hop_ms=COMPRESSOR_HOP_MS):
+    """Feed-forward RMS compressor with attack/release smoothing of the gain reduction
+
+    Levels are measured over a trailing `attack` ms window like pydub's
+    compress_dynamic_range, but the gain recovers during `release` ms once the
+    level drops below the threshold.
+    """
+    values = to_float(samples)
+    if not len(values):
+        return np.asarray(samples)
+
+    hop = max(1, int(sample_rate * hop_ms / 1000))
+    window = max(1, int(sample_rate * attack / 1000))
+
+    # Trailing-window RMS at each hop from a running sum of squares
+    energy = np.concatenate(([0.0], np.cumsum(np.square(values, dtype=np.float64))))
+    positions = np.arange(hop, len(values) + hop, hop).clip(max=len(values))
+    starts = (positions - window).clip(min=0)
+    rms = np.sqrt((energy[positions] - energy[starts]) / np.maximum(positions - starts, 1))
+
+    level_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    target = (1 - 1.0 / ratio) * np.maximum(level_db - threshold, 0.0)
+
+    # One-pole smoothing is recursive, so it runs per hop rather than per sample
+    attack_coeff = 1 - math.exp(-hop_ms / max(attack, 1e-3))
+    release_coeff = 1 - math.exp(-hop_ms / max(release, 1e-3))
+    reduction = np.empty(len(target))
+    current = 0.0
+    for i, wanted in enumerate(target.tolist()):
+        current += (wanted - current) * (attack_coeff if wanted > current else release_coeff)
+        reduction[i] = current
+
+    gain = np.interp(np.arange(len(values)), positions - 1, _db_to_gain(-reduction)).astype(np.float32)
+    return from_float(values * gain, np.asarray(samples).dtype)
+
+def downmix(samples, channels):
+    """Average interleaved channels into mono"""
+    samples = np.asarray(samples)
+    if channels == 1:
+        return samples
+    frames = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    return from_float(to_float(frames).mean(axis=1), samples.dtype)
+
+def resample(samples, source_rate, target_rate, taps=RESAMPLE_TAPS):
+    """Change the sample rate of mono samples (low-pass filtered when downsampling)"""
+    samples = np.asarray(samples)
+    if source_rate == target_rate or not len(samples):
+        return samples
+
+    values = to_float(samples)
+    if target_rate < source_rate:
+        # Windowed-sinc anti-aliasing filter at 90% of the new Nyquist frequency
+        cutoff = 0.45 * target_rate / source_rate
+        n = np.arange(taps) - (taps - 1) / 2
+        impulse = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+        values = fft_filter(values, impulse / impulse.sum())
+        values = np.concatenate((values[(taps - 1) // 2:], np.zeros((taps - 1) // 2, dtype=np.float32)))
+
+    target_length = int(round(len(values) * target_rate / source_rate))
+    positions = np.arange(target_length) * (source_rate / target_rate)
+    return from_float(np.interp(positions, np.arange(len(values)), values), samples.dtype)
+
+_SAMPLE_TYPES = {1: 'int8', 2: 'int16', 4: 'int32'}
+
+def _supported(segment):
+    return NUMPY_AVAILABLE and segment.sample_width in _SAMPLE_TYPES
+
+def segment_samples(segment):
+    """Interleaved integer samples of an AudioSegment (no copy)"""
+    return np.frombuffer(segment.raw_data, dtype=_SAMPLE_TYPES[segment.sample_width])
+
+def segment_from_samples(segment, samples, channels=None, frame_rate=None):
+    """A new AudioSegment with `segment`'s sample width and the given samples"""
+    return AudioSegment(
+        data=np.ascontiguousarray(samples, dtype=_SAMPLE_TYPES[segment.sample_width]).tobytes(),
+        sample_width=segment.sample_width,
+        frame_rate=frame_rate or segment.frame_rate,
+        channels=channels or segment.channels
+    )
+
+def _per_channel(segment, function):
+    samples = segment_samples(segment)
+    if segment.channels == 1:
+        return segment_from_samples(segment, function(samples))
+    frames = samples[:len(samples) - len(samples) % segment.channels].reshape(-1, segment.channels)
+    processed = np.stack([function(frames[:, channel]) for channel in range(segment.channels)], axis=1)
+    return segment_from_samples(segment, processed.reshape(-1))
+
+def normalize(segment, headroom=0.1):
+    """Drop-in for pydub's normalize"""
+    if not _supported(segment):
+        return segment.normalize(headroom=headroom)
+    # One gain for all channels keeps the stereo image
+    return segment_from_samples(segment, normalize_peak(segment_samples(segment), headroom))
+
+def high_pass_filter(segment, cutoff):
+    """Drop-in for pydub's high_pass_filter (12 dB/octave instead of 6)"""
+    if not _supported(segment):
+        return segment.high_pass_filter(cutoff)
+    return _per_channel(segment, lambda samples: high_pass(samples, segment.frame_rate, cutoff))
+
+def compress_dynamic_range(segment, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0):
+    """Drop-in for pydub's compress_dynamic_range"""
+    if not _supported(segment):
+        return segment.compress_dynamic_range(threshold=threshold, ratio=ratio, attack=attack, release=release)
+    return _per_channel(segment, lambda samples: compress(
+        samples, segment.frame_rate, threshold=threshold, ratio=ratio, attack=attack, release=release
+    ))
+
+def set_channels(segment, channels):
+    """Drop-in for AudioSegment.set_channels when mixing down to mono"""
+    if channels != 1 or segment.channels == 1 or not _supported(segment):
+        return segment.set_channels(channels)
+    return segment_from_samples(segment, downmix(segment_samples(segment), segment.channels), channels=1)
+
+def set_frame_rate(segment, frame_rate):
+    """Drop-in for AudioSegment.set_frame_rate on mono audio"""
+    if segment.frame_rate == frame_rate or segment.channels != 1 or not _supported(segment):
+        return segment.set_frame_rate(frame_rate)
+    return segment_from_samples(
+        segment, resample(segment_samples(segment), segment.frame_rate, frame_rate), frame_rate=frame_rate
+    )
+
+def _synthetic_speech(minutes, frame_rate=44100, channels=2):
+    """Harmonic bursts with pauses and level changes, roughly like recorded speech"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(minutes * 60 * frame_rate)) / frame_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / frame_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 2.5 * t) > -0.2) * (0.2 + 0.8 * (np.sin(2 * np.pi * 0.05 * t) > 0))
+    mono = 0.3 * voice * envelope + 0.01 * rng.standard_normal(len(t)) + 0.05 * np.sin(2 * np.pi * 50 * t)
+    samples = from_float(np.repeat(mono[:, None], channels, axis=1).reshape(-1), np.int16)
+    return AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=frame_rate, channels=channels)
+
+def _pydub_chain(segment):
+    audio = segment.normalize().set_channels(1).set_frame_rate(16000).high_pass_filter(80)
+    return audio.compress_dynamic_range(threshold=-20.0, ratio=4.0, attack=5.0, release=50.0)
+
+def _numpy_chain(segment):
+    audio = set_frame_rate(set_channels(normalize(segment), 1), 16000)
+    return compress_dynamic_range(high_pass_filter(audio, 80), threshold=-20.0, ratio=4.0, attack=5.0, release=50.0)
+
+def benchmark(durations=(1, 10, 60), pydub_limit=10):
+    """Time the pydub and NumPy preprocessing chains on synthetic 44.1 kHz stereo input
+
+    The pydub chain is extrapolated linearly above `pydub_limit` minutes, where
+    it would run for hours.
+    """
+    pydub_seconds_per_minute = None
+    for minutes in durations:
+        segment = _synthetic_speech(minutes)
+
+        start = time.perf_counter()
+        _numpy_chain(segment)
+        numpy_seconds = time.perf_counter() - start
+
+        if minutes <= pydub_limit:
+            start = time.perf_counter()
+            _pydub_chain(segment)
+            pydub_seconds = time.perf_counter() - start
+            pydub_seconds_per_minute = pydub_seconds / minutes
+            label = ""
+        elif pydub_seconds_per_minute is not None:
+            pydub_seconds = pydub_seconds_per_minute * minutes
+            label = " (est.)"
+        else:
+            pydub_seconds = None
+
+        if pydub_seconds is None:
+            print(f"⏱️ {minutes:>4g} min: numpy {numpy_seconds:8.2f}s")
+        else:
+            print(f"⏱️ {minutes:>4g} min: pydub {pydub_seconds:8.2f}s{label}  numpy {numpy_seconds:8.2f}s  "
+                  f"speedup {pydub_seconds / numpy_seconds:6.1f}x")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'benchmark' or not NUMPY_AVAILABLE:
+        print("Usage: python dsp.py benchmark [minutes ...]  (requires numpy)")
+        sys.exit(1)
+
+    benchmark([float(arg) for arg in sys.argv[2:]] or (1, 10, 60))
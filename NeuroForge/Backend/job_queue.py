@@ -0,0 +1,186 @@
+"""
+Background job queue for the translation pipeline
+Jobs are persisted in the SQLite `jobs` table so queued and interrupted work survives a restart
+"""
+
+import json
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_STAGES = ['queued', 'speech_to_text', 'translation', 'text_to_speech', 'saving', 'completed']
+JOB_MAX_ATTEMPTS = 3  # runs a job gets across restarts before it is marked failed
+
+CREATE_JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS jobs (
+    session_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'queued',
+    stage TEXT NOT NULL DEFAULT 'queued',
+    progress INTEGER NOT NULL DEFAULT 0,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def job_update(session_id, fields):
+    """UPDATE statement and parameters for a jobs row
+
+    updated_at comes from SQLite's CURRENT_TIMESTAMP, the same UTC clock and
+    'YYYY-MM-DD HH:MM:SS' format as created_at.
+    """
+    assignments = ''.join(f"{column} = ?, " for column in fields)
+    return (
+        f"UPDATE jobs SET {assignments}updated_at = CURRENT_TIMESTAMP WHERE session_id = ?",
+        list(fields.values()) + [session_id]
+    )
+
+class JobQueue:
+    """Runs `handler(session_id, params, report)` on a fixed pool of worker threads
+
+    `connect` returns a new sqlite3 connection; `report(stage, progress)` lets the
+    handler publish per-stage progress, and its return value is stored as the result.
+    A job interrupted `max_attempts` times (e.g. one that crashes the process) is
+    marked failed on the next start instead of being run again.
+    """
+
+    def __init__(self, connect, handler, workers=2, max_attempts=JOB_MAX_ATTEMPTS):
+        self.connect = connect
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the workers once and resume jobs left unfinished by the last run"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._recover()
+
+    def enqueue(self, session_id, params):
+        """Persist a new job and hand it to the workers"""
+        connection = self.connect()
+        try:
+            connection.execute(
+                "INSERT INTO jobs (session_id, params) VALUES (?, ?)",
+                (session_id, json.dumps(params))
+            )
+            connection.commit()
+        finally:
+            connection.close()
+        self._queue.put(session_id)
+        logger.info(f"Job queued: {session_id} ({self._queue.qsize()} waiting)")
+
+    def waiting(self):
+        """Jobs queued but not yet picked up by a worker"""
+        return self._queue.qsize()
+
+    def record_completed(self, session_id, params, result):
+        """Persist a job that finished without running (e.g. answered from a cache)"""
+        connection = self.connect()
+        try:
+            connection.execute(
+                "INSERT INTO jobs (session_id, status, stage, progress, params, result) "
+                "VALUES (?, 'completed', 'completed', 100, ?, ?)",
+                (session_id, json.dumps(params), json.dumps(result))
+            )
+            connection.commit()
+        finally:
+            connection.close()
+
+    def get(self, session_id):
+        """Current job record as a dict, or None"""
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT session_id, status, stage, progress, result, error, created_at, updated_at "
+                "FROM jobs WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        finally:
+            connection.close()
+
+        if not row:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def _update(self, session_id, **fields):
+        connection = self.connect()
+        try:
+            connection.execute(*job_update(session_id, fields))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _recover(self):
+        connection = self.connect()
+        try:
+            given_up = connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP "
+                "WHERE status IN ('queued', 'processing') AND attempts >= ?",
+                (f"Gave up after {self.max_attempts} interrupted attempts", self.max_attempts)
+            ).rowcount
+            connection.commit()
+            rows = connection.execute(
+                "SELECT session_id FROM jobs WHERE status IN ('queued', 'processing') ORDER BY created_at"
+            ).fetchall()
+        finally:
+            connection.close()
+
+        for row in rows:
+            self._queue.put(row['session_id'])
+        if given_up:
+            logger.warning(f"⚠️ Marked {given_up} repeatedly interrupted jobs as failed")
+        if rows:
+            logger.info(f"🔄 Resumed {len(rows)} unfinished jobs")
+
+    def _worker(self):
+        while True:
+            session_id = self._queue.get()
+            try:
+                self._run(session_id)
+            except Exception as e:
+                logger.error(f"Job worker error for {session_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, session_id):
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT params, status, attempts FROM jobs WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        finally:
+            connection.close()
+
+        if not row or row['status'] not in ('queued', 'processing'):
+            return
+
+        self._update(session_id, status='processing', stage='speech_to_text', progress=5,
+                     attempts=row['attempts'] + 1)
+
+        def report(stage, progress):
+            self._update(session_id, stage=stage, progress=int(progress))
+
+        try:
+            result = self.handler(session_id, json.loads(row['params']), report)
+            self._update(session_id, status='completed', stage='completed', progress=100,
+                         result=json.dumps(result))
+            logger.info(f"✅ Job completed: {session_id}")
+        except Exception as e:
+            logger.error(f"❌ Job failed: {session_id}: {e}")
+            self._update(session_id, status='failed', error=str(e))
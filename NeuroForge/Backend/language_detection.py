@@ -0,0 +1,84 @@
+"""
+Concurrent spoken-language detection
+Sends every candidate language to the recognizer at once and keeps the best transcript
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Shared, bounded pool so concurrent uploads cannot open unlimited recognizer connections
+DETECTION_MAX_WORKERS = 12
+DETECTION_CONFIDENCE_THRESHOLD = 0.8
+DETECTION_DEADLINE = 30.0  # seconds per detection request
+
+_executor = ThreadPoolExecutor(max_workers=DETECTION_MAX_WORKERS, thread_name_prefix="lang-detect")
+
+def length_confidence(text, full_length=100.0):
+    """Score a transcript by its length (longer transcripts mean the language fit better)"""
+    return min(len(text.strip()) / full_length, 1.0)
+
+def _attempt(recognize, lang):
+    """Run one recognition attempt, turning failures into an empty transcript"""
+    try:
+        return recognize(lang) or ""
+    except Exception as e:
+        logger.debug(f"Language detection failed for {lang}: {e}")
+        return ""
+
+def detect_language_parallel(recognize, candidates, score=length_confidence,
+                             threshold=DETECTION_CONFIDENCE_THRESHOLD,
+                             deadline=DETECTION_DEADLINE, min_length=5, executor=None):
+    """Try all candidate languages concurrently and return the best match
+
+    `recognize(lang)` returns a transcript for `lang`, or a (transcript, confidence)
+    pair when the recognizer reports its own confidence, or raises; any callable
+    works, so a local stub can stand in for the real recognizer. Detection stops as soon
+    as one transcript scores above `threshold`, and never waits past `deadline`.
+
+    Returns (language, text, confidence); language and text are None when nothing matched.
+    """
+    executor = executor or _executor
+    start = time.monotonic()
+
+    futures = {executor.submit(_attempt, recognize, lang): lang for lang in candidates}
+    order = {lang: i for i, lang in enumerate(candidates)}
+    results = {}
+    pending = set(futures)
+
+    while pending:
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            logger.warning(f"Language detection deadline reached with {len(pending)} attempts pending")
+            break
+
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+        early_exit = False
+        for future in done:
+            lang = futures[future]
+            result = future.result()
+            text, confidence = result if isinstance(result, tuple) else (result, None)
+            text = text.strip()
+            if len(text) > min_length:
+                results[lang] = (text, score(text) if confidence is None else confidence)
+                if results[lang][1] > threshold:
+                    early_exit = True
+
+        if early_exit:
+            break
+
+    # Drop attempts that have not started yet; running ones finish in the background
+    for future in pending:
+        future.cancel()
+
+    if not results:
+        return None, None, 0.0
+
+    # Highest confidence wins; ties go to the earlier candidate
+    best_lang = max(results, key=lambda lang: (results[lang][1], -order[lang]))
+    best_text, best_confidence = results[best_lang]
+    logger.info(f"Detected {best_lang} ({best_confidence:.2f}) after {time.monotonic() - start:.1f}s")
+    return best_lang, best_text, best_confidence
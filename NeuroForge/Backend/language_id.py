@@ -0,0 +1,237 @@
+"""
+Fast acoustic language identification
+Ranks candidate languages from decoded PCM before any speech recognition call
+
+The model is a small JSON file of per-language diagonal Gaussians over
+spectral and rhythm features. It is not shipped with the repo; train it from
+uploads whose source language was given explicitly, then turn the pre-filter on:
+
+    python language_id.py train [database_path]
+    LID_PREFILTER=1 python app.py
+
+Without LID_PREFILTER (or without a model) every candidate goes to the recognizer.
+"""
+
+import os
+import sys
+import json
+import math
+import sqlite3
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+LID_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lid_model.json')
+LID_PREFILTER = os.environ.get('LID_PREFILTER', '').lower() in ('1', 'true', 'yes')  # off until a model is trained
+LID_TOP_K = 3
+LID_MIN_CONFIDENCE = 0.5  # below this top posterior the model is unsure and no candidate is dropped
+LID_ANALYSIS_SECONDS = 30  # language cues are in the first seconds; bounds the cost on long files
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 400  # 25 ms
+HOP_SIZE = 160    # 10 ms
+NUM_BANDS = 20
+
+_model_cache = {}
+
+def prefilter_status(model_path=LID_MODEL_PATH):
+    """Whether rank_languages will narrow candidates, and why not when it won't"""
+    if not LID_PREFILTER:
+        return False, "disabled (set LID_PREFILTER=1 after `python language_id.py train`)"
+    if not NUMPY_AVAILABLE:
+        return False, "NumPy is not installed"
+    if not os.path.exists(model_path):
+        return False, f"no model at {model_path} (run `python language_id.py train`)"
+    return True, f"using {model_path}"
+
+def extract_features(samples, sample_rate=SAMPLE_RATE):
+    """Spectral shape, zero-crossing and syllable-rate features from mono float samples"""
+    samples = np.asarray(samples, dtype=np.float32)[:int(LID_ANALYSIS_SECONDS * sample_rate)]
+    if len(samples) < FRAME_SIZE:
+        raise ValueError("Audio too short for language identification")
+
+    # Frame the signal without copying, then window and take the power spectrum
+    frame_count = 1 + (len(samples) - FRAME_SIZE) // HOP_SIZE
+    frames = np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(frame_count, FRAME_SIZE),
+        strides=(samples.strides[0] * HOP_SIZE, samples.strides[0])
+    )
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE), axis=1)) ** 2
+
+    # Log-spaced bands between 100 Hz and the Nyquist frequency
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate)
+    edges = np.geomspace(100.0, sample_rate / 2.0, NUM_BANDS + 1)
+    band_index = np.clip(np.searchsorted(edges, freqs) - 1, 0, NUM_BANDS - 1)
+    bands = np.zeros((frame_count, NUM_BANDS), dtype=np.float64)
+    for band in range(NUM_BANDS):
+        bands[:, band] = spectrum[:, band_index == band].sum(axis=1)
+    log_bands = np.log(bands + 1e-10)
+
+    # Keep only voiced frames so silence does not dominate
+    frame_energy = log_bands.max(axis=1)
+    voiced = frame_energy > frame_energy.max() - 6.0
+    if voiced.sum() < 10:
+        voiced = np.ones(frame_count, dtype=bool)
+    voiced_bands = log_bands[voiced]
+    spectral_shape = voiced_bands - voiced_bands.mean(axis=1, keepdims=True)
+
+    signs = np.signbit(frames)
+    zcr = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)[voiced]
+
+    # Dominant 2-8 Hz modulation of the energy envelope approximates syllable rate
+    envelope = frame_energy - frame_energy.mean()
+    modulation = np.abs(np.fft.rfft(envelope))
+    mod_freqs = np.fft.rfftfreq(len(envelope), HOP_SIZE / sample_rate)
+    syllable_band = (mod_freqs >= 2.0) & (mod_freqs <= 8.0)
+    syllable_rate = mod_freqs[syllable_band][np.argmax(modulation[syllable_band])] if syllable_band.any() else 0.0
+
+    return np.concatenate([
+        spectral_shape.mean(axis=0),
+        spectral_shape.std(axis=0),
+        [zcr.mean(), zcr.std(), syllable_rate, voiced.mean()]
+    ])
+
+def samples_from_segment(segment):
+    """Mono float32 samples in [-1, 1] from a pydub AudioSegment"""
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * segment.sample_width - 1))
+
+def load_model(path=LID_MODEL_PATH):
+    """Load the bundled model, cached per file modification time"""
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _model_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        model = json.load(f)
+    _model_cache[path] = (mtime, model)
+    return model
+
+def score_languages(features, candidates, model):
+    """Posterior probability for each candidate language covered by the model"""
+    log_likelihoods = {}
+    for lang in candidates:
+        params = model['languages'].get(lang)
+        if not params:
+            continue
+        mean = np.asarray(params['mean'])
+        var = np.asarray(params['var'])
+        log_likelihoods[lang] = (
+            -0.5 * np.sum(np.log(2 * np.pi * var) + (features - mean) ** 2 / var)
+            + math.log(params.get('prior', 1.0))
+        )
+
+    if not log_likelihoods:
+        return {}
+
+    # Temper by feature count so the posterior is not one-hot for every input
+    scale = float(len(features))
+    peak = max(log_likelihoods.values())
+    weights = {lang: math.exp((ll - peak) / scale) for lang, ll in log_likelihoods.items()}
+    total = sum(weights.values())
+    return {lang: weight / total for lang, weight in weights.items()}
+
+def rank_languages(audio, candidates, top_k=LID_TOP_K, model_path=LID_MODEL_PATH,
+                   min_confidence=LID_MIN_CONFIDENCE):
+    """Order candidates by acoustic likelihood and keep the top_k
+
+    `audio` is a PreparedAudio (or anything with a pydub `segment`). Returns
+    a list of (language, probability). Candidates are only dropped when the
+    best one reaches `min_confidence`; an unsure model returns all of them,
+    most likely first. When LID_PREFILTER is off, or no model or NumPy is
+    available, the candidates come back unchanged so detection still works,
+    just slower.
+    """
+    fallback = [(lang, 1.0 / len(candidates)) for lang in candidates] if candidates else []
+
+    if not LID_PREFILTER or not NUMPY_AVAILABLE:
+        return fallback
+    model = load_model(model_path)
+    if not model:
+        return fallback
+
+    try:
+        features = extract_features(samples_from_segment(audio.segment))
+        posteriors = score_languages(features, candidates, model)
+    except Exception as e:
+        logger.warning(f"Acoustic language ID failed, trying all candidates: {e}")
+        return fallback
+
+    if not posteriors:
+        return fallback
+
+    ranked = sorted(posteriors.items(), key=lambda item: item[1], reverse=True)
+    if ranked[0][1] >= min_confidence:
+        ranked = ranked[:top_k]
+    else:
+        logger.info(f"Acoustic language ID unsure (best {ranked[0][1]:.2f}), keeping every candidate")
+
+    # Candidates the model has never seen are still worth one recognizer call each
+    unknown = [(lang, 0.0) for lang in candidates if lang not in posteriors]
+    logger.info(f"Acoustic language ID: {', '.join(f'{lang}={p:.2f}' for lang, p in ranked)}")
+    return ranked + unknown
+
+def train_model(labelled_samples, path=LID_MODEL_PATH):
+    """Fit per-language Gaussians from (language, samples) pairs and save them"""
+    features_by_lang = {}
+    for lang, samples in labelled_samples:
+        try:
+            features_by_lang.setdefault(lang, []).append(extract_features(samples))
+        except Exception as e:
+            logger.warning(f"Skipping training sample for {lang}: {e}")
+
+    total = sum(len(rows) for rows in features_by_lang.values())
+    model = {'features': None, 'languages': {}}
+    for lang, rows in features_by_lang.items():
+        matrix = np.vstack(rows)
+        model['features'] = matrix.shape[1]
+        model['languages'][lang] = {
+            'mean': matrix.mean(axis=0).tolist(),
+            'var': np.maximum(matrix.var(axis=0), 1e-3).tolist(),
+            'prior': len(rows) / total,
+            'samples': len(rows)
+        }
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(model, f)
+    return model
+
+def _labelled_uploads(database_path):
+    """Yield (language, samples) for stored uploads whose source language was chosen by the user"""
+    from audio_processing import prepare_audio
+
+    connection = sqlite3.connect(database_path)
+    rows = connection.execute("""
+        SELECT source_language, original_audio_path FROM translations
+        WHERE source_language IS NOT NULL AND source_language != 'auto'
+          AND original_audio_path IS NOT NULL
+    """).fetchall()
+    connection.close()
+
+    for lang, audio_path in rows:
+        if not os.path.exists(audio_path):
+            continue
+        try:
+            yield lang, samples_from_segment(prepare_audio(audio_path).segment)
+        except Exception as e:
+            logger.warning(f"Could not decode {audio_path}: {e}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'train':
+        print("Usage: python language_id.py train [database_path]")
+        sys.exit(1)
+
+    database_path = sys.argv[2] if len(sys.argv) > 2 else 'neuroforge.db'
+    trained = train_model(_labelled_uploads(database_path))
+    for lang, params in sorted(trained['languages'].items()):
+        print(f"🌍 {lang}: {params['samples']} samples")
+    print(f"✅ Language ID model saved: {LID_MODEL_PATH}")
@@ -0,0 +1,80 @@
+"""
+Versioned schema migrations
+Each migration runs once, in its own transaction, and records itself in PRAGMA user_version
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_CHUNK_ROWS = 5000  # rows per statement when migrations copy or rewrite data
+
+def schema_version(cursor):
+    return cursor.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(connection, migrations):
+    """Bring the database up to the newest of `migrations`
+
+    `migrations` is a list of (version, description, function(cursor)) in
+    ascending order. An up-to-date database costs one header read. A failing
+    migration is rolled back and leaves the database at the previous version.
+    Returns the resulting schema version.
+    """
+    cursor = connection.cursor()
+    current = schema_version(cursor)
+    if current >= migrations[-1][0]:
+        return current
+
+    for version, description, migrate in migrations:
+        if version <= current:
+            continue
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the write lock
+            if schema_version(cursor) >= version:
+                connection.rollback()
+                current = version
+                continue
+            migrate(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            logger.error(f"❌ Migration {version} ({description}) failed and was rolled back")
+            raise
+        current = version
+        logger.info(f"🗄️ Applied migration {version}: {description}")
+
+    cursor.close()
+    return current
+
+def table_columns(cursor, table):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def add_missing_columns(cursor, table, columns):
+    """ALTER TABLE ADD COLUMN for each (name, definition) the table lacks; returns the names added"""
+    existing = set(table_columns(cursor, table))
+    added = []
+    for name, definition in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            added.append(name)
+    return added
+
+def copy_rows(cursor, source, target, columns, chunk_rows=MIGRATION_CHUNK_ROWS):
+    """Copy named columns from `source` to `target` in rowid ranges
+
+    Runs inside the caller's migration transaction; chunking keeps each
+    statement's working set small on large tables. Returns rows copied.
+    """
+    column_list = ', '.join(columns)
+    low, high = cursor.execute(f"SELECT COALESCE(MIN(rowid), 0), COALESCE(MAX(rowid), -1) FROM {source}").fetchone()
+    copied = 0
+    for start in range(low, high + 1, chunk_rows):
+        cursor.execute(
+            f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {source} "
+            f"WHERE rowid >= ? AND rowid < ?",
+            (start, start + chunk_rows)
+        )
+        copied += cursor.rowcount
+    return copied
@@ -0,0 +1,193 @@
+"""
+Database schema
+Versioned migrations for neuroforge.db, applied by the web app at startup and by the bulk CLI before it runs
+"""
+
+import hashlib
+import logging
+from db_pool import connect
+from job_queue import CREATE_JOBS_TABLE
+from migrations import apply_migrations, table_columns, add_missing_columns, copy_rows, MIGRATION_CHUNK_ROWS
+from search_index import ensure_search_index
+from translation_cache import create_cache_table
+from tts_store import create_store_table
+
+logger = logging.getLogger(__name__)
+
+def hash_password(password):
+    """Hash password using SHA-256"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+TRANSLATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    original_filename TEXT,
+    original_audio_path TEXT,
+    source_language TEXT DEFAULT 'en',
+    detected_source_language TEXT,
+    target_language TEXT,
+    original_text TEXT,
+    translated_text TEXT,
+    audio_path TEXT,
+    translated_audio_path TEXT,
+    translated_audio_url TEXT,
+    file_size INTEGER,
+    processing_time REAL,
+    confidence_score REAL DEFAULT 0.0,
+    voice_type TEXT DEFAULT 'standard',
+    audio_duration REAL DEFAULT 0.0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Columns older translations tables may lack, as ALTER TABLE ADD COLUMN definitions
+TRANSLATIONS_COLUMNS = [
+    ('session_id', 'TEXT'),
+    ('original_filename', 'TEXT'),
+    ('original_audio_path', 'TEXT'),
+    ('source_language', "TEXT DEFAULT 'en'"),
+    ('detected_source_language', 'TEXT'),
+    ('target_language', 'TEXT'),
+    ('original_text', 'TEXT'),
+    ('translated_text', 'TEXT'),
+    ('audio_path', 'TEXT'),
+    ('translated_audio_path', 'TEXT'),
+    ('translated_audio_url', 'TEXT'),
+    ('file_size', 'INTEGER'),
+    ('processing_time', 'REAL'),
+    ('confidence_score', 'REAL DEFAULT 0.0'),
+    ('voice_type', "TEXT DEFAULT 'standard'"),
+    ('audio_duration', 'REAL DEFAULT 0.0')
+]
+
+def migrate_baseline_schema(cursor):
+    """Users, jobs and translations tables; older translations tables are upgraded in place"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT NOT NULL,
+        role TEXT DEFAULT 'user',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    
+    # Jobs table for the background pipeline queue
+    cursor.execute(CREATE_JOBS_TABLE)
+    
+    existing_columns = table_columns(cursor, 'translations')
+    if existing_columns and ('id' not in existing_columns or 'created_at' not in existing_columns):
+        # Key and timestamp columns cannot be added with ALTER TABLE: copy the rows
+        # by name into a fresh table, in chunks, inside this migration's transaction
+        known_columns = {'id', 'created_at'} | {name for name, _ in TRANSLATIONS_COLUMNS}
+        cursor.execute(TRANSLATIONS_TABLE.format(name='translations_migrated'))
+        copied = copy_rows(cursor, 'translations', 'translations_migrated',
+                           [column for column in existing_columns if column in known_columns])
+        cursor.execute("DROP TABLE translations")
+        cursor.execute("ALTER TABLE translations_migrated RENAME TO translations")
+        logger.info(f"Copied {copied} translation records into the current table layout")
+    else:
+        cursor.execute(TRANSLATIONS_TABLE.format(name='translations'))
+        added = add_missing_columns(cursor, 'translations', TRANSLATIONS_COLUMNS)
+        if added:
+            logger.info(f"Added translation columns: {', '.join(added)}")
+    
+    # Insert default users
+    default_users = [
+        ('superadmin@neuroforge.com', hash_password('super123'), 'Super Administrator', 'superadmin'),
+        ('admin@neuroforge.com', hash_password('admin123'), 'Administrator', 'admin'),
+        ('user@neuroforge.com', hash_password('user123'), 'Demo User', 'user')
+    ]
+    for email, password, name, role in default_users:
+        cursor.execute("INSERT OR IGNORE INTO users (email, password, name, role) VALUES (?, ?, ?, ?)",
+                       (email, password, name, role))
+
+def migrate_content_hash(cursor):
+    """Upload fingerprint for reusing results of identical uploads"""
+    add_missing_columns(cursor, 'translations', [('content_hash', 'TEXT')])
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_content_hash
+    ON translations(content_hash, source_language, target_language, voice_type)
+    """)
+
+def migrate_timestamps(cursor):
+    """Rows restored by the old drop-and-recreate startup carry ISO 'T' timestamps; align them"""
+    last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM translations").fetchone()[0]
+    for start in range(0, last_id, MIGRATION_CHUNK_ROWS):
+        cursor.execute("""
+        UPDATE translations SET created_at = replace(substr(created_at, 1, 19), 'T', ' ')
+        WHERE id > ? AND id <= ? AND created_at LIKE '____-__-__T%'
+        """, (start, start + MIGRATION_CHUNK_ROWS))
+
+def migrate_history_indexes(cursor):
+    """Newest-first keyset scans; the unfiltered index carries every light column"""
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_history_created
+    ON translations(created_at DESC, id DESC, session_id, original_filename, source_language,
+                    detected_source_language, target_language, translated_audio_url, file_size,
+                    processing_time, confidence_score, voice_type, audio_duration)
+    """)
+    for column in ('target_language', 'detected_source_language', 'voice_type'):
+        cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_history_{column}
+        ON translations({column}, created_at DESC, id DESC)
+        """)
+
+def migrate_search_index(cursor):
+    """Full-text search over transcripts and translations"""
+    ensure_search_index(cursor)
+
+def migrate_batch_sessions(cursor):
+    """Outputs of a multi-language upload point at the batch's parent session"""
+    add_missing_columns(cursor, 'translations', [('parent_session_id', 'TEXT')])
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_parent_session ON translations(parent_session_id)")
+
+def migrate_translation_cache(cursor):
+    """SQLite tier of the translation cache"""
+    create_cache_table(cursor)
+
+def migrate_tts_store(cursor):
+    """Reference-counted index of synthesized voice blobs"""
+    create_store_table(cursor)
+
+BATCH_PROGRESS_TABLE = """
+CREATE TABLE IF NOT EXISTS batch_progress (
+    file_path TEXT NOT NULL,
+    target_language TEXT NOT NULL,
+    voice_type TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_mtime INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (file_path, target_language, voice_type)
+)
+"""
+
+def migrate_batch_progress(cursor):
+    """Per (file, language, voice) checkpoint of the bulk CLI"""
+    cursor.execute(BATCH_PROGRESS_TABLE)
+
+# Append new migrations with the next version number; never edit applied ones
+SCHEMA_MIGRATIONS = [
+    (1, "baseline schema", migrate_baseline_schema),
+    (2, "upload content hash", migrate_content_hash),
+    (3, "normalize timestamps", migrate_timestamps),
+    (4, "history indexes", migrate_history_indexes),
+    (5, "full-text search", migrate_search_index),
+    (6, "batch parent sessions", migrate_batch_sessions),
+    (7, "translation cache", migrate_translation_cache),
+    (8, "voice store", migrate_tts_store),
+    (9, "bulk translation checkpoint", migrate_batch_progress),
+]
+
+def migrate_database(database_path):
+    """Bring the database at `database_path` up to date; returns its schema version"""
+    connection = connect(database_path)
+    try:
+        return apply_migrations(connection, SCHEMA_MIGRATIONS)
+    finally:
+        connection.close()
@@ -0,0 +1,137 @@
+"""
+Full-text search over past translations
+An external-content FTS5 index mirrors translations.original_text/translated_text and is kept in sync by triggers
+"""
+
+import html
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SNIPPET_TOKENS = 12
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# snippet() marks matches with these private-use characters; the text is escaped before they become tags
+_MATCH_START = '\ue000'
+_MATCH_END = '\ue001'
+
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS translations_fts USING fts5(
+    original_text,
+    translated_text,
+    content='translations',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+SEARCH_TRIGGERS = {
+    'translations_fts_insert': """
+    CREATE TRIGGER IF NOT EXISTS translations_fts_insert AFTER INSERT ON translations BEGIN
+        INSERT INTO translations_fts (rowid, original_text, translated_text)
+        VALUES (new.id, new.original_text, new.translated_text);
+    END
+    """,
+    'translations_fts_delete': """
+    CREATE TRIGGER IF NOT EXISTS translations_fts_delete AFTER DELETE ON translations BEGIN
+        INSERT INTO translations_fts (translations_fts, rowid, original_text, translated_text)
+        VALUES ('delete', old.id, old.original_text, old.translated_text);
+    END
+    """,
+    'translations_fts_update': """
+    CREATE TRIGGER IF NOT EXISTS translations_fts_update AFTER UPDATE OF original_text, translated_text ON translations BEGIN
+        INSERT INTO translations_fts (translations_fts, rowid, original_text, translated_text)
+        VALUES ('delete', old.id, old.original_text, old.translated_text);
+        INSERT INTO translations_fts (rowid, original_text, translated_text)
+        VALUES (new.id, new.original_text, new.translated_text);
+    END
+    """
+}
+
+SEARCH_FIELDS = {'original': 'original_text', 'translated': 'translated_text'}
+
+def fts5_available(cursor):
+    try:
+        return bool(cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+    except sqlite3.Error:
+        return False
+
+def ensure_search_index(cursor):
+    """Create the FTS table and triggers; rebuild from `translations` when either was missing
+
+    Returns False when this SQLite build has no FTS5.
+    """
+    if not fts5_available(cursor):
+        logger.warning("⚠️ SQLite was built without FTS5; /search is disabled")
+        return False
+
+    existing = {row[0] for row in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name = 'translations_fts' OR name IN ({})".format(
+            ', '.join('?' for _ in SEARCH_TRIGGERS)
+        ), list(SEARCH_TRIGGERS)
+    )}
+    cursor.execute(CREATE_SEARCH_TABLE)
+    for trigger in SEARCH_TRIGGERS.values():
+        cursor.execute(trigger)
+
+    # A new index, or triggers lost with a recreated table, means the index is stale
+    if len(existing) < len(SEARCH_TRIGGERS) + 1:
+        cursor.execute("INSERT INTO translations_fts (translations_fts) VALUES ('rebuild')")
+        logger.info("🔎 Full-text search index rebuilt from existing translations")
+    return True
+
+def build_match_query(text, field=None):
+    """A safe FTS5 query from free text: every word must match, a trailing * matches prefixes"""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+    if not terms:
+        return None
+    query = ' '.join(terms)
+    return f"{SEARCH_FIELDS[field]} : ({query})" if field else query
+
+def highlight(snippet):
+    """HTML-safe snippet: the transcript text is escaped and only the match markers become <mark> tags"""
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet)
+    return escaped.replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_END, HIGHLIGHT_END)
+
+def search_translations(cursor, match_query, limit=SEARCH_DEFAULT_LIMIT, offset=0, snapshot=None):
+    """Best matches first, paged by position among rows with ids up to `snapshot`
+
+    `snapshot` is the newest id when the first page was read, so rows added
+    later never show up mid-way. Every insert moves the absolute bm25 values
+    of existing matches, which is why pages are not keyed on rank; their
+    relative order is far steadier, but a delete, or a multi-word query whose
+    term weights shift, can still repeat or skip a result at a page boundary.
+
+    Returns (results, has_more, snapshot).
+    """
+    if snapshot is None:
+        snapshot = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM translations").fetchone()[0]
+
+    cursor.execute(f"""
+    SELECT t.id, t.session_id, t.original_filename, t.detected_source_language, t.target_language,
+           t.voice_type, t.translated_audio_url, t.created_at,
+           translations_fts.rank AS rank,
+           snippet(translations_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS original_snippet,
+           snippet(translations_fts, 1, ?, ?, '…', {SNIPPET_TOKENS}) AS translated_snippet
+    FROM translations_fts
+    JOIN translations t ON t.id = translations_fts.rowid
+    WHERE translations_fts MATCH ? AND translations_fts.rowid <= ?
+    ORDER BY translations_fts.rank, translations_fts.rowid
+    LIMIT ? OFFSET ?
+    """, [_MATCH_START, _MATCH_END, _MATCH_START, _MATCH_END, match_query, snapshot, limit + 1, offset])
+
+    rows = [dict(row) for row in cursor.fetchall()]
+    for row in rows:
+        row['original_snippet'] = highlight(row['original_snippet'])
+        row['translated_snippet'] = highlight(row['translated_snippet'])
+    return rows[:limit], len(rows) > limit, snapshot
@@ -0,0 +1,148 @@
+"""
+Streaming voice translation pipeline
+Recognized segments go to translation, and translated sentences go to TTS, as soon as each is ready
+"""
+
+import queue
+import threading
+import logging
+
+from audio_processing import iter_transcript, translate_text, split_sentences, iter_synthesized
+
+logger = logging.getLogger(__name__)
+
+STAGE_QUEUE_SIZE = 4  # items buffered between stages; bounds memory on long media
+
+_DONE = object()
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+def run_stages(source, *stages, queue_size=STAGE_QUEUE_SIZE):
+    """Chain stages on their own threads with bounded queues between them
+
+    `source` is an iterable; each stage is `function(item) -> iterable of outputs`.
+    Yields the outputs of the last stage in order. An exception in any stage is
+    re-raised in the consumer, and abandoning the generator stops the threads.
+    """
+    stop = threading.Event()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(out_q):
+        try:
+            for item in source:
+                if not put(out_q, item):
+                    return
+        except Exception as e:
+            put(out_q, _StageError(e))
+        put(out_q, _DONE)
+
+    def transform(stage, in_q, out_q):
+        while not stop.is_set():
+            try:
+                item = in_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE or isinstance(item, _StageError):
+                put(out_q, item)
+                return
+            try:
+                for output in stage(item):
+                    if not put(out_q, output):
+                        return
+            except Exception as e:
+                put(out_q, _StageError(e))
+                put(out_q, _DONE)
+                return
+
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=produce, args=(queues[0],), daemon=True)]
+    for i, stage in enumerate(stages):
+        threads.append(threading.Thread(target=transform, args=(stage, queues[i], queues[i + 1]), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+def stream_translation(audio, sr_lang, src_lang, target_lang, tts_lang, voice_type, out_file,
+                       on_progress=None, transcript=None):
+    """Recognize, translate and synthesize a PreparedAudio as a stream
+
+    MP3 fragments are appended to `out_file` as each sentence is synthesized,
+    so playback can start long before the whole recording is processed.
+    `on_progress(segments_done, segment_count)` is called after each segment's
+    audio is written. Pass already-recognized segments as `transcript` to skip
+    recognition. Returns (original_text, segments, translated_text, audio_written,
+    voice_complete); voice_complete is False when a segment or sentence could
+    not be translated or voiced, so the audio must not be cached as the text's voice.
+    """
+    segments = []
+    translated_parts = []
+    audio_written = False
+    voice_complete = True
+    needs_translation = src_lang != target_lang
+
+    def translate(segment):
+        segments.append({'start': segment['start'], 'end': segment['end'], 'text': segment['text']})
+        translated = translate_text(segment['text'], src_lang=src_lang, target_lang=target_lang) \
+            if needs_translation else segment['text']
+        if translated.startswith('Translation error'):
+            logger.warning(f"Segment {segment['index']} not translated: {translated}")
+            sentences = []
+        else:
+            sentences = split_sentences(translated)
+        
+        yield segment, translated, sentences
+
+    def synthesize(item):
+        segment, translated, sentences = item
+        yield segment, translated, None
+        
+        # Sentences are voiced concurrently; fragments still come out in order
+        for fragment in iter_synthesized(sentences, lang=tts_lang, voice_type=voice_type, skip_errors=True):
+            yield segment, None, fragment
+
+    # MP3 frames are self-contained, so fragments can simply be appended
+    with open(out_file, 'wb') as output:
+        current_index = None
+        segment_count = 1
+        for segment, translated, fragment in run_stages(
+            transcript or iter_transcript(audio, sr_lang), translate, synthesize
+        ):
+            if translated is not None:
+                if translated.startswith('Translation error'):
+                    voice_complete = False
+                if current_index is not None and on_progress:
+                    on_progress(current_index + 1, segment['count'])
+                current_index = segment['index']
+                segment_count = segment['count']
+                translated_parts.append(translated)
+            if fragment:
+                output.write(fragment)
+                output.flush()
+                audio_written = True
+            elif fragment is not None:
+                voice_complete = False  # a sentence that failed to synthesize
+        if current_index is not None and on_progress:
+            on_progress(segment_count, segment_count)
+
+    original_text = ' '.join(segment['text'] for segment in segments)
+    return original_text, segments, ' '.join(translated_parts), audio_written, voice_complete
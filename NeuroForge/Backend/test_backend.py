@@ -0,0 +1,682 @@
+"""
+Backend unit tests
+Run from Backend with `python -m unittest test_backend`. Google recognition,
+translation and TTS are replaced by local stubs, and the app runs in a
+temporary directory with its own database.
+"""
+
+import io
+import os
+import math
+import time
+import wave
+import struct
+import shutil
+import sqlite3
+import tempfile
+import types
+import unittest
+
+app = None
+audio_processing = None
+_workdir = None
+_cwd = None
+
+def make_wav(seconds=3.0, frame_rate=16000):
+    """A mono 16-bit tone; the stubbed recognizer does not care what it says"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(frame_rate)
+        wav.writeframes(b''.join(
+            struct.pack('<h', int(8000 * math.sin(2 * math.pi * 440 * i / frame_rate)))
+            for i in range(int(seconds * frame_rate))
+        ))
+    return buffer.getvalue()
+
+class StubTranslator:
+    def __init__(self, source, target):
+        self.target = target
+
+    def translate(self, text):
+        return f"{self.target}: {text}"
+
+class StubSpeech:
+    def __init__(self, text, lang, slow=False):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        fp.write(b'ID3' + self.text.encode('utf-8'))
+
+def setUpModule():
+    global app, audio_processing, _workdir, _cwd
+    os.environ['AUDIO_WORKERS'] = '0'
+    _cwd = os.getcwd()
+    _workdir = tempfile.mkdtemp(prefix='neuroforge-test-')
+    shutil.copytree(os.path.join(_cwd, 'static'), os.path.join(_workdir, 'static'))
+    os.chdir(_workdir)
+
+    import audio_processing
+    import app
+    audio_processing.recognizer.recognize_google = lambda audio, language=None, **kwargs: "hello world from the test"
+    audio_processing.GoogleTranslator = StubTranslator
+    audio_processing.gTTS = StubSpeech
+    app.get_audio_duration = lambda path: 1.0
+
+def tearDownModule():
+    app.translation_recorder.close()
+    os.chdir(_cwd)
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+def wait_for_job(session_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = app.job_queue.get(session_id)
+        if job and job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {session_id} did not finish")
+
+class BatchReuseTest(unittest.TestCase):
+    def test_single_upload_reusing_batch_target_survives_batch_rerun(self):
+        client = app.app.test_client()
+        audio = make_wav()
+
+        response = client.post('/upload_batch', data={
+            'file': (io.BytesIO(audio), 'clip.wav'), 'source_language': 'en', 'target_languages': 'hi,mr'
+        })
+        self.assertEqual(response.status_code, 202)
+        batch_id = response.json['session_id']
+        self.assertEqual(wait_for_job(batch_id)['status'], 'completed')
+        app.translation_recorder.flush()
+
+        # Same bytes and settings as the 'hi' target: answered from that target's row
+        response = client.post('/upload', data={
+            'file': (io.BytesIO(audio), 'clip.wav'), 'source_language': 'en', 'target_language': 'hi'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json['cached'])
+        single_id = response.json['session_id']
+        app.translation_recorder.flush()
+
+        # Resume the batch as a restart would; it replaces only its own rows
+        connection = app.get_db_connection()
+        connection.execute("UPDATE jobs SET status = 'processing' WHERE session_id = ?", (batch_id,))
+        connection.commit()
+        connection.close()
+        app.job_queue._run(batch_id)
+        app.translation_recorder.flush()
+
+        connection = app.get_db_connection()
+        single = connection.execute(
+            "SELECT parent_session_id, translated_audio_path FROM translations WHERE session_id = ?", (single_id,)
+        ).fetchone()
+        batch_rows = connection.execute(
+            "SELECT COUNT(*) FROM translations WHERE parent_session_id = ?", (batch_id,)
+        ).fetchone()[0]
+        connection.close()
+
+        self.assertIsNotNone(single)
+        self.assertIsNone(single['parent_session_id'])
+        self.assertTrue(os.path.exists(single['translated_audio_path']))
+        self.assertEqual(batch_rows, 2)
+
+class StoredVoiceStreamTest(unittest.TestCase):
+    def setUp(self):
+        # send_file resolves relative paths against the Flask root, not the test's working directory
+        self.store_root = app.tts_store.root
+        app.tts_store.root = os.path.abspath(self.store_root)
+
+    def tearDown(self):
+        app.tts_store.root = self.store_root
+
+    def test_finished_batch_target_is_served_while_the_batch_runs(self):
+        speech = audio_processing.gTTS
+        recognize = audio_processing.recognizer.recognize_google
+
+        class SlowMarathiSpeech(StubSpeech):
+            def __init__(self, text, lang, slow=False):
+                super().__init__(text, lang, slow)
+                if lang == 'mr':
+                    time.sleep(2.0)
+
+        audio_processing.gTTS = SlowMarathiSpeech
+        audio_processing.recognizer.recognize_google = lambda audio, language=None, **kwargs: (
+            "a sentence only the stored voice test recognizes"
+        )
+        try:
+            client = app.app.test_client()
+            response = client.post('/upload_batch', data={
+                'file': (io.BytesIO(make_wav(2.2)), 'slow.wav'), 'source_language': 'en', 'target_languages': 'hi,mr'
+            })
+            batch_id = response.json['session_id']
+            hindi = next(t['session_id'] for t in response.json['targets'] if t['target_language'] == 'hi')
+
+            deadline = time.time() + 10
+            while hindi not in app.stored_voices and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertIn(hindi, app.stored_voices)
+
+            started = time.monotonic()
+            response = client.get(f'/stream_audio/{hindi}')
+            body = response.get_data()
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(body.startswith(b'ID3'))
+            self.assertLess(time.monotonic() - started, 1.0)
+            self.assertEqual(app.job_queue.get(batch_id)['status'], 'processing')
+            response.close()
+            wait_for_job(batch_id)
+        finally:
+            audio_processing.gTTS = speech
+            audio_processing.recognizer.recognize_google = recognize
+
+    def test_live_stream_falls_back_to_the_stored_file(self):
+        stored = os.path.join(_workdir, 'stored-voice.mp3')
+        with open(stored, 'wb') as f:
+            f.write(b'ID3 stored voice')
+        app.stored_voices['moved-session'] = stored
+        try:
+            body = b''.join(app.follow_audio_file('moved-session', os.path.join(_workdir, 'gone.mp3')))
+        finally:
+            app.stored_voices.pop('moved-session', None)
+        self.assertEqual(body, b'ID3 stored voice')
+
+class RecorderTest(unittest.TestCase):
+    def test_completed_job_row_is_already_committed(self):
+        client = app.app.test_client()
+        response = client.post('/upload', data={
+            'file': (io.BytesIO(make_wav(2.0)), 'short.wav'), 'source_language': 'en', 'target_language': 'ta'
+        })
+        session_id = response.json['session_id']
+        self.assertEqual(wait_for_job(session_id)['status'], 'completed')
+
+        # No flush here: completion must only be reported once the row is on disk
+        connection = app.get_db_connection()
+        row = connection.execute("SELECT 1 FROM translations WHERE session_id = ?", (session_id,)).fetchone()
+        connection.close()
+        self.assertIsNotNone(row)
+
+    def test_wait_written_times_out_while_writes_fail(self):
+        from translation_recorder import TranslationRecorder
+
+        def broken_connect():
+            raise OSError("disk unavailable")
+
+        recorder = TranslationRecorder(broken_connect, flush_interval_ms=10)
+        recorder.record({'session_id': 'pending-session'})
+        self.assertFalse(recorder.wait_written(['pending-session'], timeout=0.2))
+        self.assertIsNotNone(recorder.pending('pending-session'))
+        recorder.close()
+
+    def test_a_rejected_row_does_not_block_the_rest(self):
+        import json
+        import sqlite3
+        from translation_recorder import TranslationRecorder, TRANSLATION_COLUMNS
+
+        database_path = os.path.join(_workdir, 'recorder.db')
+        connection = sqlite3.connect(database_path)
+        connection.execute(
+            f"CREATE TABLE translations ({', '.join(TRANSLATION_COLUMNS)}, CHECK (original_text IS NOT NULL))"
+        )
+        connection.commit()
+        connection.close()
+
+        dead_letter_path = os.path.join(_workdir, 'dead-letter.jsonl')
+        recorder = TranslationRecorder(lambda: sqlite3.connect(database_path), flush_interval_ms=60000,
+                                       max_attempts=2, dead_letter_path=dead_letter_path)
+        recorder.record({'session_id': 'bad-row', 'original_text': None})
+        recorder.record({'session_id': 'good-row', 'original_text': 'fine'})
+
+        self.assertEqual(recorder.flush(), 1)
+        self.assertTrue(recorder.wait_written(['good-row'], timeout=0))
+        self.assertIsNotNone(recorder.pending('bad-row'))
+
+        self.assertEqual(recorder.flush(), 0)
+        self.assertIsNone(recorder.pending('bad-row'))
+        self.assertFalse(recorder.wait_written(['bad-row'], timeout=0))
+        with open(dead_letter_path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['row']['session_id'] for line in f], ['bad-row'])
+        self.assertEqual(recorder.stats()['dead_lettered'], 1)
+        recorder.close()
+
+    def test_close_dead_letters_rows_it_could_not_write(self):
+        import json
+        from translation_recorder import TranslationRecorder
+
+        def broken_connect():
+            raise OSError("disk unavailable")
+
+        dead_letter_path = os.path.join(_workdir, 'shutdown-dead-letter.jsonl')
+        recorder = TranslationRecorder(broken_connect, flush_interval_ms=60000, dead_letter_path=dead_letter_path)
+        recorder.record({'session_id': 'unwritten-row'})
+        recorder.close()
+
+        self.assertFalse(recorder.wait_written(['unwritten-row'], timeout=0))
+        with open(dead_letter_path, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['row']['session_id'], 'unwritten-row')
+
+class TTSStoreTest(unittest.TestCase):
+    def test_evict_keeps_a_blob_referenced_after_it_was_chosen(self):
+        from tts_store import TTSStore
+
+        store = TTSStore(database_path='neuroforge.db', root=os.path.join(_workdir, 'evict-store'))
+        blob_hash = 'e' * 64
+        store.put_bytes(blob_hash, b'ID3 evictable')
+        path = store.path_for(blob_hash)
+        store.quota_bytes = 0
+
+        # A re-upload takes a reference between eviction's SELECT and its DELETE
+        exclusive = store._exclusive
+        def racing_exclusive():
+            store._exclusive = exclusive
+            store.acquire(path)
+            return exclusive()
+        store._exclusive = racing_exclusive
+        store.evict()
+
+        self.assertTrue(os.path.exists(path))
+        ref_count = store._connection().execute(
+            "SELECT ref_count FROM tts_store WHERE blob_hash = ?", (blob_hash,)
+        ).fetchone()[0]
+        self.assertEqual(ref_count, 1)
+
+    def test_quota_only_counts_unreferenced_blobs(self):
+        from schema import migrate_database
+        from tts_store import TTSStore
+
+        database_path = os.path.join(_workdir, 'quota.db')
+        migrate_database(database_path)
+        store = TTSStore(database_path=database_path, root=os.path.join(_workdir, 'quota-store'), quota_bytes=100)
+        voice_path = os.path.join(_workdir, 'session-voice.mp3')
+        with open(voice_path, 'wb') as f:
+            f.write(b'ID3' + b'v' * 497)
+        session_blob = store.store_file('a' * 64, voice_path)
+
+        # 500 bytes of session voice leave the 100-byte cache untouched
+        store.put_bytes('b' * 64, b'ID3' + b'1' * 27)
+        self.assertTrue(os.path.exists(store.path_for('b' * 64)))
+        self.assertEqual(store.stats()['cache_bytes'], 30)
+
+        # Going over the quota evicts the least recently used cache blobs down to 90%
+        for name in 'cde':
+            time.sleep(0.01)
+            store.put_bytes(name * 64, b'ID3' + name.encode() * 27)
+        self.assertFalse(os.path.exists(store.path_for('b' * 64)))
+        self.assertTrue(os.path.exists(store.path_for('e' * 64)))
+        self.assertTrue(os.path.exists(session_blob))
+        self.assertEqual(store.stats()['cache_bytes'], 90)
+
+        # A released session voice becomes an evictable cache entry
+        store.release(session_blob)
+        self.assertFalse(os.path.exists(session_blob))
+        self.assertLessEqual(store.stats()['cache_bytes'], 90)
+
+    def test_voice_with_failed_sentences_is_not_reused(self):
+        recognize = audio_processing.recognizer.recognize_google
+        speech = audio_processing.gTTS
+
+        class FlakySpeech(StubSpeech):
+            def write_to_fp(self, fp):
+                if 'broken' in self.text:
+                    raise ConnectionError("TTS unavailable")
+                super().write_to_fp(fp)
+
+        audio_processing.recognizer.recognize_google = lambda audio, language=None, **kwargs: (
+            "This first sentence has a broken part in it. The second sentence is perfectly fine to voice."
+        )
+        audio_processing.gTTS = FlakySpeech
+        try:
+            client = app.app.test_client()
+            audio = make_wav(2.5)
+            form = {'source_language': 'en', 'target_language': 'ml'}
+            response = client.post('/upload', data=dict(form, file=(io.BytesIO(audio), 'partial.wav')))
+            session_id = response.json['session_id']
+            self.assertEqual(wait_for_job(session_id)['status'], 'completed')
+            result = client.get(f'/jobs/{session_id}/result').json
+            self.assertTrue(result['audio_available'])
+
+            record = app.get_translation_record(session_id, "translated_audio_path, translated_text")
+            full_key = app.tts_store.key_for(record['translated_text'], 'ml', 'standard')
+            self.assertNotEqual(os.path.basename(record['translated_audio_path']), f"{full_key}.mp3")
+            self.assertIsNone(app.tts_store.get_bytes(full_key))
+
+            # The retry runs the pipeline again instead of reusing the partial voice
+            response = client.post('/upload', data=dict(form, file=(io.BytesIO(audio), 'partial.wav')))
+            self.assertEqual(response.status_code, 202)
+            wait_for_job(response.json['session_id'])
+        finally:
+            audio_processing.recognizer.recognize_google = recognize
+            audio_processing.gTTS = speech
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        import schema
+        from db_pool import connect
+        from job_queue import JobQueue
+
+        database_path = os.path.join(_workdir, 'jobs.db')
+        schema.migrate_database(database_path)
+
+        def connect_rows():
+            connection = connect(database_path)
+            connection.row_factory = sqlite3.Row
+            return connection
+
+        self.connect = connect_rows
+        self.queue = JobQueue(connect_rows, lambda session_id, params, report: {'ok': True}, workers=1,
+                              max_attempts=3)
+
+    def test_restart_resumes_jobs_but_fails_repeatedly_interrupted_ones(self):
+        connection = self.connect()
+        connection.executemany(
+            "INSERT INTO jobs (session_id, status, params, attempts) VALUES (?, 'processing', '{}', ?)",
+            [('crashes-the-worker', 3), ('interrupted-once', 1)]
+        )
+        connection.commit()
+        connection.close()
+
+        self.queue.start()
+        self.queue._queue.join()
+
+        crashing = self.queue.get('crashes-the-worker')
+        self.assertEqual(crashing['status'], 'failed')
+        self.assertIn('3', crashing['error'])
+        resumed = self.queue.get('interrupted-once')
+        self.assertEqual(resumed['status'], 'completed')
+        self.assertEqual(resumed['result'], {'ok': True})
+
+        # created_at and updated_at share SQLite's UTC clock and format
+        for job in (crashing, resumed):
+            self.assertRegex(job['updated_at'], r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+            self.assertGreaterEqual(job['updated_at'], job['created_at'])
+
+class AudioMetadataTest(unittest.TestCase):
+    # MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding, stereo: 144 * 128000 / 44100 = 417-byte frames
+    FRAME_HEADER = b'\xff\xfb\x90\x00'
+    FRAME_BYTES = 417
+
+    def write(self, name, data):
+        path = os.path.join(_workdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def frames(self, count, first_frame_tag=b''):
+        frame = self.FRAME_HEADER + bytes(self.FRAME_BYTES - 4)
+        # The Xing tag sits after the 32 bytes of stereo MPEG-1 side information
+        first = self.FRAME_HEADER + bytes(32) + first_frame_tag
+        first += bytes(self.FRAME_BYTES - len(first))
+        return first + frame * (count - 1)
+
+    def test_constant_bitrate_mp3_after_an_id3_tag(self):
+        from audio_metadata import get_audio_metadata
+
+        id3 = b'ID3\x04\x00\x00\x00\x00\x00\x14' + bytes(20)
+        metadata = get_audio_metadata(self.write('cbr.mp3', id3 + self.frames(100)), allow_decode=False)
+        self.assertEqual(metadata['codec'], 'mp3')
+        self.assertEqual((metadata['frame_rate'], metadata['channels'], metadata['bitrate']), (44100, 2, 128000))
+        self.assertAlmostEqual(metadata['duration'], 100 * self.FRAME_BYTES * 8 / 128000, places=6)
+
+    def test_xing_frame_count_gives_the_exact_duration(self):
+        from audio_metadata import get_audio_metadata
+
+        audio_bytes = 100 * self.FRAME_BYTES
+        tag = b'Xing' + struct.pack('>III', 3, 100, audio_bytes)
+        metadata = get_audio_metadata(self.write('vbr.mp3', self.frames(100, tag)), allow_decode=False)
+        self.assertAlmostEqual(metadata['duration'], 100 * 1152 / 44100, places=6)
+
+    def test_wav_header(self):
+        from audio_metadata import get_audio_metadata
+
+        metadata = get_audio_metadata(self.write('tone.wav', make_wav(1.5)), allow_decode=False)
+        self.assertEqual(metadata['codec'], 'pcm')
+        self.assertEqual((metadata['frame_rate'], metadata['channels'], metadata['sample_width']), (16000, 1, 2))
+        self.assertAlmostEqual(metadata['duration'], 1.5)
+        self.assertEqual(metadata['file_size'], os.path.getsize(os.path.join(_workdir, 'tone.wav')))
+
+class MigrationTest(unittest.TestCase):
+    def migrate(self, name, create_sql, rows_sql):
+        """Build a version-0 database with `create_sql`, then run every schema migration on it"""
+        from db_pool import connect
+        from migrations import apply_migrations, table_columns
+        from schema import SCHEMA_MIGRATIONS
+
+        path = os.path.join(_workdir, name)
+        connection = sqlite3.connect(path)
+        connection.execute(create_sql)
+        connection.execute(rows_sql)
+        connection.commit()
+        connection.close()
+
+        connection = connect(path)
+        version = apply_migrations(connection, SCHEMA_MIGRATIONS)
+        self.assertEqual(version, SCHEMA_MIGRATIONS[-1][0])
+        self.assertEqual(connection.execute("PRAGMA user_version").fetchone()[0], version)
+
+        columns = table_columns(connection.cursor(), 'translations')
+        for column in ('id', 'session_id', 'created_at', 'content_hash', 'parent_session_id', 'audio_duration'):
+            self.assertIn(column, columns)
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in ('users', 'jobs', 'translations_fts', 'translation_cache', 'tts_store', 'batch_progress'):
+            self.assertIn(table, tables)
+        return connection
+
+    def test_original_translations_table(self):
+        connection = self.migrate('v0.db', """
+            CREATE TABLE translations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                original_filename TEXT,
+                original_audio_path TEXT,
+                source_language TEXT DEFAULT 'en',
+                detected_source_language TEXT,
+                target_language TEXT,
+                original_text TEXT,
+                translated_text TEXT,
+                audio_path TEXT,
+                translated_audio_path TEXT,
+                translated_audio_url TEXT,
+                file_size INTEGER,
+                processing_time REAL,
+                confidence_score REAL DEFAULT 0.0,
+                voice_type TEXT DEFAULT 'standard',
+                audio_duration REAL DEFAULT 0.0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""", """
+            INSERT INTO translations (session_id, target_language, original_text, translated_text, created_at)
+            VALUES ('old-session', 'hi', 'good morning', 'suprabhat', '2024-03-01T08:30:00.123456')""")
+        row = connection.execute(
+            "SELECT session_id, target_language, translated_text, created_at FROM translations"
+        ).fetchone()
+        self.assertEqual(tuple(row), ('old-session', 'hi', 'suprabhat', '2024-03-01 08:30:00'))
+        matches = connection.execute(
+            "SELECT rowid FROM translations_fts WHERE translations_fts MATCH 'morning'"
+        ).fetchall()
+        self.assertEqual(len(matches), 1)
+        connection.close()
+
+    def test_translations_table_without_key_or_timestamp(self):
+        connection = self.migrate('v0-bare.db', """
+            CREATE TABLE translations (session_id TEXT, target_language TEXT, translated_text TEXT, notes TEXT)
+            """, """
+            INSERT INTO translations VALUES ('bare-session', 'mr', 'namaskar', 'dropped')""")
+        row = connection.execute("SELECT id, session_id, target_language, translated_text FROM translations").fetchone()
+        self.assertEqual(tuple(row), (1, 'bare-session', 'mr', 'namaskar'))
+        connection.close()
+
+class HistoryTest(unittest.TestCase):
+    def test_fields_may_name_the_keyset_column(self):
+        client = app.app.test_client()
+        response = client.get('/history?fields=created_at')
+        self.assertEqual(response.status_code, 200)
+        for entry in response.json['history']:
+            self.assertEqual(set(entry), {'created_at'})
+
+        response = client.get('/history?fields=session_id,created_at')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/history?fields=id').status_code, 400)
+
+class SearchTest(unittest.TestCase):
+    def record(self, session_id, original_text):
+        connection = app.get_db_connection()
+        connection.execute(
+            "INSERT INTO translations (session_id, original_text, translated_text, target_language) VALUES (?, ?, ?, ?)",
+            (session_id, original_text, "translated", 'fr')
+        )
+        connection.commit()
+        connection.close()
+
+    def test_snippets_escape_transcript_html(self):
+        self.record('search-xss', '<img src=x onerror=alert(1)> zebracorn sighting')
+        response = app.app.test_client().get('/search?q=zebracorn')
+        self.assertEqual(response.status_code, 200)
+        snippet = response.json['results'][0]['original_snippet']
+        self.assertNotIn('<img', snippet)
+        self.assertIn('&lt;img', snippet)
+        self.assertIn('<mark>zebracorn</mark>', snippet)
+
+    def test_pages_exclude_rows_added_after_the_first_page(self):
+        for i in range(3):
+            self.record(f'search-page-{i}', f'quokka number {i}')
+        client = app.app.test_client()
+        first = client.get('/search?q=quokka&limit=2').json
+        self.record('search-page-late', 'quokka arriving late')
+        second = client.get(f"/search?q=quokka&limit=2&cursor={first['next_cursor']}").json
+
+        sessions = [r['session_id'] for r in first['results'] + second['results']]
+        self.assertEqual(sorted(sessions), ['search-page-0', 'search-page-1', 'search-page-2'])
+
+class LanguageRankingTest(unittest.TestCase):
+    def setUp(self):
+        import json
+        import language_id
+        from pydub import AudioSegment
+
+        self.json = json
+        self.language_id = language_id
+        self.prefilter = language_id.LID_PREFILTER
+        language_id.LID_PREFILTER = True
+        self.audio = types.SimpleNamespace(segment=AudioSegment.from_wav(io.BytesIO(make_wav(2.0))))
+        self.features = language_id.extract_features(language_id.samples_from_segment(self.audio.segment))
+        self.models = 0
+
+    def tearDown(self):
+        self.language_id.LID_PREFILTER = self.prefilter
+
+    def write_model(self, offsets):
+        """One unit-variance Gaussian per language, its mean `offset` away from this test's audio"""
+        self.models += 1
+        path = os.path.join(_workdir, f'lid_model_{self.id()}_{self.models}.json')
+        languages = {
+            lang: {'mean': (self.features + offset).tolist(), 'var': [1.0] * len(self.features), 'prior': 0.25}
+            for lang, offset in offsets.items()
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            self.json.dump({'features': len(self.features), 'languages': languages}, f)
+        return path
+
+    def test_confident_model_keeps_top_k_and_unknown_languages(self):
+        model_path = self.write_model({'en': 0.0, 'es': 3.0, 'fr': 5.0, 'de': -5.0})
+        ranked = self.language_id.rank_languages(
+            self.audio, ['fr', 'en', 'de', 'es', 'ja'], top_k=2, model_path=model_path
+        )
+        self.assertEqual([lang for lang, _ in ranked], ['en', 'es', 'ja'])
+        self.assertGreater(ranked[0][1], 0.9)
+
+    def test_unsure_model_keeps_every_candidate(self):
+        model_path = self.write_model({'en': 0.0, 'es': 0.0, 'fr': 0.0, 'de': 0.0})
+        ranked = self.language_id.rank_languages(
+            self.audio, ['fr', 'en', 'de', 'es', 'ja'], top_k=2, model_path=model_path
+        )
+        self.assertEqual(sorted(lang for lang, _ in ranked), ['de', 'en', 'es', 'fr', 'ja'])
+
+    def test_disabled_prefilter_leaves_candidates_unchanged(self):
+        self.language_id.LID_PREFILTER = False
+        model_path = self.write_model({'en': 0.0, 'es': 3.0, 'fr': 5.0})
+        ranked = self.language_id.rank_languages(self.audio, ['fr', 'en', 'es'], top_k=1, model_path=model_path)
+        self.assertEqual([lang for lang, _ in ranked], ['fr', 'en', 'es'])
+
+class LanguageDetectionTest(unittest.TestCase):
+    def test_stops_at_the_first_confident_transcript(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from language_detection import detect_language_parallel
+
+        calls = []
+        def recognize(lang):
+            calls.append(lang)
+            if lang == 'fr':
+                return "bonjour tout le monde", 0.95
+            time.sleep(0.5)
+            return "something else entirely", 0.6
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        started = time.monotonic()
+        lang, text, confidence = detect_language_parallel(
+            recognize, ['fr', 'en', 'es', 'de', 'it'], executor=executor
+        )
+        elapsed = time.monotonic() - started
+        executor.shutdown(wait=True)
+
+        self.assertEqual((lang, text, confidence), ('fr', "bonjour tout le monde", 0.95))
+        self.assertLess(elapsed, 0.4)
+        # Attempts queued behind the two workers were cancelled, not run
+        self.assertLess(len(calls), 5)
+
+    def test_returns_the_best_result_so_far_at_the_deadline(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from language_detection import detect_language_parallel
+
+        def recognize(lang):
+            if lang == 'en':
+                return "hello there everyone", 0.5
+            time.sleep(1.0)
+            return "much too late to count", 0.99
+
+        executor = ThreadPoolExecutor(max_workers=3)
+        started = time.monotonic()
+        lang, text, confidence = detect_language_parallel(
+            recognize, ['en', 'hi', 'ja'], deadline=0.3, executor=executor
+        )
+        elapsed = time.monotonic() - started
+        executor.shutdown(wait=True)
+
+        self.assertEqual((lang, confidence), ('en', 0.5))
+        self.assertLess(elapsed, 0.8)
+
+    def test_pending_attempts_are_cancelled(self):
+        from concurrent.futures import Future
+        from language_detection import detect_language_parallel
+
+        class ManualExecutor:
+            """Runs only 'en'; every other attempt stays queued until cancelled"""
+            def __init__(self):
+                self.futures = {}
+
+            def submit(self, fn, recognize, lang):
+                future = Future()
+                if lang == 'en':
+                    future.set_result(fn(recognize, lang))
+                self.futures[lang] = future
+                return future
+
+        executor = ManualExecutor()
+        lang, _, _ = detect_language_parallel(
+            lambda lang: ("a confident english transcript", 0.9), ['hi', 'en', 'ja', 'ko'], executor=executor
+        )
+
+        self.assertEqual(lang, 'en')
+        self.assertEqual(sorted(l for l, f in executor.futures.items() if f.cancelled()), ['hi', 'ja', 'ko'])
+
+    def test_failures_and_short_transcripts_are_ignored(self):
+        from language_detection import detect_language_parallel
+
+        def recognize(lang):
+            if lang == 'en':
+                raise ConnectionError("recognizer unavailable")
+            return "hm"
+
+        self.assertEqual(detect_language_parallel(recognize, ['en', 'fr']), (None, None, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+Content-addressed translation cache
+An in-process LRU in front of an SQLite table in neuroforge.db, keyed by (normalized text hash, source, target)
+"""
+
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from db_pool import connect
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = 'neuroforge.db'
+CACHE_MEMORY_ITEMS = 2048
+CACHE_MAX_ROWS = 200000
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+CACHE_EVICTION_INTERVAL = 500  # writes between size/TTL sweeps of the SQLite tier
+
+CREATE_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS translation_cache (
+    cache_key TEXT PRIMARY KEY,
+    source_language TEXT NOT NULL,
+    target_language TEXT NOT NULL,
+    translated_text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+def create_cache_table(cursor):
+    """Table and LRU index for the SQLite tier (applied by schema.SCHEMA_MIGRATIONS)"""
+    cursor.execute(CREATE_CACHE_TABLE)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON translation_cache(last_used_at)")
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace so trivially different inputs share an entry"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+def cache_key(text, src_lang, target_lang):
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f"{src_lang}:{target_lang}:{digest}"
+
+class TranslationCache:
+    """Two-tier translation cache with TTL and size-based eviction"""
+
+    def __init__(self, database_path=DATABASE_PATH, memory_items=CACHE_MEMORY_ITEMS,
+                 max_rows=CACHE_MAX_ROWS, ttl=CACHE_TTL_SECONDS):
+        self.database_path = database_path
+        self.memory_items = memory_items
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def _connection(self):
+        # One connection per thread; the cache is used from worker pools
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = connect(self.database_path)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _remember(self, key, translated, created_at):
+        with self._lock:
+            self._memory[key] = (translated, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, text, src_lang, target_lang):
+        """Cached translation or None"""
+        key = cache_key(text, src_lang, target_lang)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT translated_text, created_at FROM translation_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                connection.execute(
+                    "UPDATE translation_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                    (now, key)
+                )
+                connection.commit()
+                self._remember(key, row[0], row[1])
+                self._count('db_hits')
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache read failed: {e}")
+
+        self._count('misses')
+        return None
+
+    def put(self, text, src_lang, target_lang, translated):
+        """Store a translation in both tiers"""
+        key = cache_key(text, src_lang, target_lang)
+        now = time.time()
+        self._remember(key, translated, now)
+
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO translation_cache "
+                "(cache_key, source_language, target_language, translated_text, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, src_lang, target_lang, translated, now, now)
+            )
+            connection.commit()
+            self._count('writes')
+
+            with self._lock:
+                self._writes += 1
+                sweep = self._writes % CACHE_EVICTION_INTERVAL == 0
+            if sweep:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation cache write failed: {e}")
+
+    def evict(self):
+        """Drop expired rows, then the least recently used rows above max_rows"""
+        connection = self._connection()
+        expired = connection.execute(
+            "DELETE FROM translation_cache WHERE created_at < ?", (time.time() - self.ttl,)
+        ).rowcount
+        overflow = connection.execute("SELECT COUNT(*) FROM translation_cache").fetchone()[0] - self.max_rows
+        if overflow > 0:
+            connection.execute(
+                "DELETE FROM translation_cache WHERE cache_key IN "
+                "(SELECT cache_key FROM translation_cache ORDER BY last_used_at LIMIT ?)",
+                (overflow,)
+            )
+        connection.commit()
+
+        evicted = expired + max(overflow, 0)
+        if evicted:
+            with self._lock:
+                self.counters['evictions'] += evicted
+            logger.info(f"Translation cache evicted {evicted} entries")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
+
+translation_cache = TranslationCache()
@@ -0,0 +1,228 @@
+"""
+Write-behind recording of finished translations
+Rows are queued in memory and written with executemany in one transaction every N rows or T milliseconds
+"""
+
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+RECORDER_BATCH_SIZE = 50
+RECORDER_FLUSH_INTERVAL_MS = 200
+RECORDER_MAX_ATTEMPTS = 5  # failed inserts of one row before it is dead-lettered
+
+TRANSLATION_COLUMNS = (
+    'session_id', 'original_filename', 'original_audio_path', 'source_language', 'detected_source_language',
+    'target_language', 'original_text', 'translated_text', 'audio_path', 'translated_audio_path',
+    'translated_audio_url', 'file_size', 'processing_time', 'confidence_score', 'voice_type', 'audio_duration',
+    'content_hash', 'parent_session_id'
+)
+
+INSERT_TRANSLATION = (
+    f"INSERT INTO translations ({', '.join(TRANSLATION_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in TRANSLATION_COLUMNS)})"
+)
+
+class TranslationRecorder:
+    """Batches `translations` inserts so a burst of uploads shares one commit
+
+    `connect` returns a connection with close(). Rows stay readable through
+    pending() until their batch is committed, and wait_written() lets a job
+    hold back its completion until its row is on disk. A row the database
+    keeps rejecting is dead-lettered after `max_attempts` tries (appended as
+    JSON to `dead_letter_path`, when set) so it cannot hold up later rows.
+    """
+
+    def __init__(self, connect, batch_size=RECORDER_BATCH_SIZE, flush_interval_ms=RECORDER_FLUSH_INTERVAL_MS,
+                 max_attempts=RECORDER_MAX_ATTEMPTS, dead_letter_path=None):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self._pending = {}    # session_id -> row, not yet written
+        self._inflight = {}   # session_id -> row, being written
+        self._attempts = {}   # session_id -> failed inserts of its current row
+        self._failed = {}     # session_id -> error, for dead-lettered rows
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)  # wakes the flush thread
+        self._written = threading.Condition(self._lock)    # wakes wait_written() callers
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self.counters = {'rows': 0, 'batches': 0, 'failures': 0, 'dead_lettered': 0}
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="translation-recorder", daemon=True)
+                self._thread.start()
+
+    def record(self, row):
+        """Queue a translation row (a dict with TRANSLATION_COLUMNS keys)"""
+        with self._condition:
+            self._pending[row['session_id']] = {column: row.get(column) for column in TRANSLATION_COLUMNS}
+            self._attempts.pop(row['session_id'], None)
+            self._failed.pop(row['session_id'], None)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        self.start()
+
+    def pending(self, session_id):
+        """The not-yet-committed row for a session, or None (read-your-writes)"""
+        with self._condition:
+            row = self._pending.get(session_id) or self._inflight.get(session_id)
+            return dict(row) if row else None
+
+    def find_pending(self, **criteria):
+        """The newest uncommitted row whose columns equal `criteria`, or None"""
+        with self._condition:
+            rows = list(self._inflight.values()) + list(self._pending.values())
+        for row in reversed(rows):
+            if all(row.get(column) == value for column, value in criteria.items()):
+                return dict(row)
+        return None
+
+    def wait_written(self, session_ids, timeout=None):
+        """Block until the rows of `session_ids` are committed
+
+        False if `timeout` passes first or a row was dead-lettered instead.
+        """
+        with self._lock:
+            settled = self._written.wait_for(
+                lambda: not any(sid in self._pending or sid in self._inflight for sid in session_ids), timeout
+            )
+            return settled and not any(sid in self._failed for sid in session_ids)
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows written
+
+        If the batch insert fails, its rows are inserted one by one so a single
+        bad row only delays itself. When the database cannot be reached at all,
+        the rows are kept without counting an attempt.
+        """
+        with self._flush_lock:
+            with self._condition:
+                if not self._pending:
+                    return 0
+                self._inflight, self._pending = self._pending, {}
+                batch = list(self._inflight.values())
+
+            rejected = []  # (row, error) refused by the database
+            connection = None
+            try:
+                connection = self.connect()
+                try:
+                    connection.executemany(INSERT_TRANSLATION, [self._values(row) for row in batch])
+                except Exception as e:
+                    connection.rollback()
+                    logger.warning(f"⚠️ Batch of {len(batch)} translation rows failed ({e}); writing them one by one")
+                    for row in batch:
+                        try:
+                            connection.execute(INSERT_TRANSLATION, self._values(row))
+                        except Exception as row_error:
+                            rejected.append((row, row_error))
+                connection.commit()
+            except Exception as e:
+                # Nothing was committed: keep the rows (newer records for the same session win)
+                logger.error(f"❌ Failed to write {len(batch)} translation rows: {e}")
+                with self._condition:
+                    self._requeue(batch)
+                    self.counters['failures'] += 1
+                return 0
+            finally:
+                if connection:
+                    connection.close()
+
+            dead = []
+            with self._condition:
+                retry = []
+                for row, error in rejected:
+                    attempts = self._attempts.get(row['session_id'], 0) + 1
+                    self._attempts[row['session_id']] = attempts
+                    if attempts >= self.max_attempts:
+                        dead.append((row, error))
+                    else:
+                        logger.warning(f"⚠️ Translation row {row['session_id']} rejected "
+                                       f"(attempt {attempts}/{self.max_attempts}): {error}")
+                        retry.append(row)
+                self._requeue(retry)
+                written = len(batch) - len(rejected)
+                for row in batch:
+                    if row['session_id'] not in self._pending:
+                        self._attempts.pop(row['session_id'], None)
+                self.counters['rows'] += written
+                self.counters['batches'] += 1
+                if rejected:
+                    self.counters['failures'] += 1
+            self._dead_letter(dead)
+            return written
+
+    @staticmethod
+    def _values(row):
+        return tuple(row[column] for column in TRANSLATION_COLUMNS)
+
+    def _requeue(self, rows):
+        """Put unwritten rows back ahead of newer ones (call holding the lock)"""
+        self._inflight, pending = {}, self._pending
+        self._pending = {row['session_id']: row for row in rows}
+        self._pending.update(pending)
+        self._written.notify_all()
+
+    def _dead_letter(self, rejected):
+        """Give up on rows: log them, append them to dead_letter_path, and fail their waiters"""
+        if not rejected:
+            return
+        for row, error in rejected:
+            logger.error(f"❌ Dead-lettering translation row {row['session_id']}: {error}")
+        if self.dead_letter_path:
+            try:
+                with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                    for row, error in rejected:
+                        f.write(json.dumps({'row': row, 'error': str(error), 'failed_at': time.time()},
+                                           ensure_ascii=False, default=str) + '\n')
+            except OSError as e:
+                logger.error(f"❌ Could not write dead-letter file {self.dead_letter_path}: {e}")
+        with self._condition:
+            for row, error in rejected:
+                self._failed[row['session_id']] = str(error)
+                self._attempts.pop(row['session_id'], None)
+            self.counters['dead_lettered'] += len(rejected)
+            self._written.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopped and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                stopped = self._stopped
+            self.flush()
+            if stopped:
+                return
+
+    def close(self):
+        """Stop the flush thread and write any remaining rows (call at shutdown)"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout=10)
+        self.flush()
+
+        # Whatever is still queued cannot be written any more
+        with self._condition:
+            leftover, self._pending = list(self._pending.values()), {}
+        if leftover:
+            logger.error(f"❌ {len(leftover)} translation rows were not written before shutdown")
+            self._dead_letter([(row, "not written before shutdown") for row in leftover])
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self.counters)
+            stats['pending'] = len(self._pending) + len(self._inflight)
+            stats['dead_letter_path'] = self.dead_letter_path
+        return stats
@@ -0,0 +1,282 @@
+"""
+Content-addressed store for synthesized voice
+MP3 blobs are named by the hash of (text, language, voice type) and indexed with reference counts in neuroforge.db
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+import unicodedata
+import logging
+from db_pool import connect
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = 'neuroforge.db'
+STORE_FOLDER = os.path.join('output_audio', 'store')
+STORE_QUOTA_BYTES = 2 * 1024 * 1024 * 1024  # cap on unreferenced (cache) blobs; session voice is never evicted
+STORE_EVICT_TARGET = 0.9  # eviction frees cache down to this fraction of the quota
+EVICT_BATCH = 256  # least recently used candidates read per eviction query
+
+CREATE_STORE_TABLE = """
+CREATE TABLE IF NOT EXISTS tts_store (
+    blob_hash TEXT PRIMARY KEY,
+    language TEXT,
+    voice_type TEXT,
+    size INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+)
+"""
+
+def store_folder_for(database_path):
+    """The blob folder that belongs with a database's index: output_audio/store beside it"""
+    return os.path.join(os.path.dirname(os.path.abspath(database_path)), STORE_FOLDER)
+
+def create_store_table(cursor):
+    """Blob index and LRU index for the store (applied by schema.SCHEMA_MIGRATIONS)"""
+    cursor.execute(CREATE_STORE_TABLE)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tts_store_lru ON tts_store(ref_count, last_used_at)")
+
+class TTSStore:
+    """Deduplicated MP3 blobs with reference counting and LRU eviction under a disk quota
+
+    Sessions hold references to their full voice output, so those blobs are never
+    evicted and do not count against the quota; sentence-level blobs are
+    unreferenced cache entries, and only their bytes are capped. The cache size
+    is kept as a running count, updated as blobs are written, referenced,
+    released and evicted, and re-read from the index when eviction runs (so
+    writes by other processes are caught up then).
+    """
+
+    def __init__(self, database_path=DATABASE_PATH, root=STORE_FOLDER, quota_bytes=STORE_QUOTA_BYTES):
+        self.database_path = database_path
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache_bytes = None  # bytes of unreferenced blobs; None until first read from the index
+        self.counters = {'hits': 0, 'misses': 0, 'writes': 0, 'deduplicated': 0, 'evictions': 0}
+
+    @staticmethod
+    def key_for(text, lang, voice_type):
+        normalized = ' '.join(unicodedata.normalize('NFC', text).split())
+        return hashlib.sha256(f"{lang}\0{voice_type}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def path_for(self, blob_hash):
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.root, blob_hash[:2], f"{blob_hash}.mp3")
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = connect(self.database_path)
+            self._local.connection = connection
+        return connection
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        """A write transaction that also orders blob file changes across threads and processes
+
+        Storing, re-referencing and evicting a blob each happen inside one, so
+        eviction can never unlink a file that another writer has just claimed.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def _count_cache(self, delta):
+        with self._lock:
+            if self._cache_bytes is not None:
+                self._cache_bytes += delta
+
+    def _index(self, connection, blob_hash, lang, voice_type, size, refs):
+        """Record a blob (or bump its use) in the caller's transaction; returns True if it was already indexed"""
+        now = time.time()
+        row = connection.execute(
+            "SELECT ref_count, size FROM tts_store WHERE blob_hash = ?", (blob_hash,)
+        ).fetchone()
+        if row:
+            connection.execute(
+                "UPDATE tts_store SET ref_count = ref_count + ?, last_used_at = ? WHERE blob_hash = ?",
+                (refs, now, blob_hash)
+            )
+            if row[0] == 0 and refs > 0:
+                self._count_cache(-row[1])  # a cache entry became session voice
+            return True
+        connection.execute(
+            "INSERT INTO tts_store (blob_hash, language, voice_type, size, ref_count, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (blob_hash, lang, voice_type, size, refs, now, now)
+        )
+        if refs == 0:
+            self._count_cache(size)
+        return False
+
+    def _change_refs(self, blob_hash, delta):
+        """Add `delta` references to a blob, keeping the cache size in step"""
+        with self._exclusive() as connection:
+            row = connection.execute(
+                "SELECT ref_count, size FROM tts_store WHERE blob_hash = ?", (blob_hash,)
+            ).fetchone()
+            if not row:
+                return
+            ref_count = max(row[0] + delta, 0)
+            connection.execute(
+                "UPDATE tts_store SET ref_count = ?, last_used_at = ? WHERE blob_hash = ?",
+                (ref_count, time.time(), blob_hash)
+            )
+        if row[0] == 0 and ref_count > 0:
+            self._count_cache(-row[1])
+        elif row[0] > 0 and ref_count == 0:
+            self._count_cache(row[1])
+
+    def get_bytes(self, blob_hash):
+        """MP3 bytes for a blob, or None"""
+        path = self.path_for(blob_hash)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self._count('misses')
+            return None
+
+        try:
+            connection = self._connection()
+            connection.execute("UPDATE tts_store SET last_used_at = ? WHERE blob_hash = ?", (time.time(), blob_hash))
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"TTS store index update failed: {e}")
+        self._count('hits')
+        return data
+
+    def put_bytes(self, blob_hash, data, lang=None, voice_type=None):
+        """Store MP3 bytes as an unreferenced (evictable) blob"""
+        path = self.path_for(blob_hash)
+        try:
+            with self._exclusive() as connection:
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    temp_path = f"{path}.{threading.get_ident()}.tmp"
+                    with open(temp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(temp_path, path)
+                self._index(connection, blob_hash, lang, voice_type, len(data), refs=0)
+            self._count('writes')
+            self._enforce_quota()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"TTS store write failed: {e}")
+
+    def store_file(self, blob_hash, file_path, lang=None, voice_type=None):
+        """Move a finished voice file into the store and take a reference to it
+
+        If an identical blob already exists the new file is discarded. Returns
+        the blob path, which sessions record as their audio path.
+        """
+        path = self.path_for(blob_hash)
+        size = os.path.getsize(file_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._exclusive() as connection:
+            if os.path.exists(path):
+                os.remove(file_path)
+                self._count('deduplicated')
+            else:
+                os.replace(file_path, path)
+                self._count('writes')
+            self._index(connection, blob_hash, lang, voice_type, size, refs=1)
+        self._enforce_quota()
+        return path
+
+    def _blob_hash_for_path(self, path):
+        blob_hash = os.path.splitext(os.path.basename(path or ''))[0]
+        if not path or os.path.abspath(self.path_for(blob_hash)) != os.path.abspath(path):
+            return None
+        return blob_hash
+
+    def acquire(self, path):
+        """Take one more reference to the blob at `path` (ignored for paths outside the store)"""
+        blob_hash = self._blob_hash_for_path(path)
+        if blob_hash:
+            self._change_refs(blob_hash, 1)
+
+    def release(self, path):
+        """Drop one reference to the blob at `path` (ignored for paths outside the store)"""
+        blob_hash = self._blob_hash_for_path(path)
+        if blob_hash:
+            self._change_refs(blob_hash, -1)
+        self._enforce_quota()
+
+    def _read_cache_bytes(self):
+        return self._connection().execute(
+            "SELECT COALESCE(SUM(size), 0) FROM tts_store WHERE ref_count = 0"
+        ).fetchone()[0]
+
+    def _enforce_quota(self):
+        with self._lock:
+            cache_bytes = self._cache_bytes
+        if cache_bytes is None:
+            cache_bytes = self._read_cache_bytes()
+            with self._lock:
+                if self._cache_bytes is None:
+                    self._cache_bytes = cache_bytes
+        if cache_bytes > self.quota_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used unreferenced blobs until the cache is back under its target"""
+        cache_bytes = self._read_cache_bytes()
+        target = int(self.quota_bytes * STORE_EVICT_TARGET)
+        evicted = 0
+
+        while cache_bytes > target:
+            rows = self._connection().execute(
+                "SELECT blob_hash, size FROM tts_store WHERE ref_count = 0 ORDER BY last_used_at LIMIT ?",
+                (EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            for blob_hash, size in rows:
+                if cache_bytes <= target:
+                    break
+                # The guarded delete decides: a blob referenced again since the SELECT keeps its file
+                with self._exclusive() as connection:
+                    if connection.execute(
+                        "DELETE FROM tts_store WHERE blob_hash = ? AND ref_count = 0", (blob_hash,)
+                    ).rowcount != 1:
+                        continue
+                    try:
+                        os.remove(self.path_for(blob_hash))
+                    except FileNotFoundError:
+                        pass
+                cache_bytes -= size
+                evicted += 1
+
+        with self._lock:
+            self._cache_bytes = cache_bytes
+        if evicted:
+            self._count('evictions', evicted)
+            logger.info(f"TTS store evicted {evicted} blobs")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['cache_bytes'] = self._cache_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+tts_store = TTSStore()
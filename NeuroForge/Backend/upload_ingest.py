@@ -0,0 +1,152 @@
+"""
+Streaming upload ingestion
+Multipart file parts are written straight to the upload folder while they are hashed,
+sniffed for a media signature and, for streamable formats, already decoded
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+
+from audio_decoder import ffmpeg_available, StreamingDecoder
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 4096  # media type is decided once this much has arrived
+
+# Formats ffmpeg can decode from a pipe without seeking
+STREAMABLE_FORMATS = {'mp3', 'wav', 'ogg', 'webm', 'flac'}
+
+class UnsupportedUpload(Exception):
+    """The upload's content is not a recognised audio or video container
+
+    Deliberately not a ValueError: Werkzeug's form parser silently swallows those.
+    """
+
+def sniff_media_type(header):
+    """Container format from the first bytes of a file, or None"""
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0):
+        return 'mp3'  # ID3 tag or MPEG audio frame sync (also ADTS AAC)
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'RIFF' and header[8:12] == b'AVI ':
+        return 'avi'
+    if header[4:8] == b'ftyp':
+        return 'mp4'  # MP4, M4A and MOV
+    if header[4:8] in (b'moov', b'mdat', b'wide', b'free', b'skip'):
+        return 'mov'  # QuickTime files without an ftyp box
+    if header[:4] == b'OggS':
+        return 'ogg'
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'  # Matroska/WebM EBML header
+    if header[:4] == b'fLaC':
+        return 'flac'
+    return None
+
+class UploadWriter:
+    """Werkzeug file stream that lands a multipart file part on disk as it arrives
+
+    Used as the request's stream factory. The part is written to a temporary
+    name in `folder`; claim() moves it to its final name. Unclaimed parts are
+    deleted when the request closes its files.
+    """
+
+    def __init__(self, folder, early_decode=True):
+        self.path = os.path.join(folder, f"upload_{uuid.uuid4().hex}.part")
+        self.size = 0
+        self.media_type = None
+        self.decoder = None
+        self._early_decode = early_decode
+        self._digest = hashlib.sha256()
+        self._header = b''
+        self._file = open(self.path, 'wb')
+        self._reader = None
+        self._claimed = False
+
+    @property
+    def content_hash(self):
+        return self._digest.hexdigest()
+
+    def _sniff(self):
+        self.media_type = sniff_media_type(self._header)
+        if self.media_type is None:
+            raise UnsupportedUpload("File content is not a supported audio or video format")
+
+        if self._early_decode and self.media_type in STREAMABLE_FORMATS and ffmpeg_available():
+            try:
+                self.decoder = StreamingDecoder(os.path.splitext(self.path)[0] + '.pcm')
+                self.decoder.feed(self._header)
+            except OSError as e:
+                logger.warning(f"Early decoding unavailable: {e}")
+                self.decoder = None
+
+    def write(self, data):
+        try:
+            self._digest.update(data)
+            self._file.write(data)
+            self.size += len(data)
+
+            if self.media_type is None:
+                self._header += data
+                if len(self._header) >= SNIFF_BYTES:
+                    self._sniff()
+            elif self.decoder:
+                self.decoder.feed(data)
+        except Exception:
+            self.discard()
+            raise
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        # Werkzeug rewinds the stream once the part is complete
+        self._file.flush()
+        if self.media_type is None:
+            try:
+                self._sniff()
+            except Exception:
+                self.discard()
+                raise
+        return 0
+
+    def tell(self):
+        return self.size
+
+    def read(self, size=-1):
+        # Only for code that reads the FileStorage back; the route uses claim()
+        if self._reader is None:
+            self._file.flush()
+            self._reader = open(self.path, 'rb')
+        return self._reader.read(size)
+
+    def claim(self, final_path):
+        """Move the finished upload to `final_path` without waiting for the decoder
+
+        Returns the early StreamingDecoder (still draining; the caller now owns
+        it and calls finish() or abort()), or None.
+        """
+        self._file.close()
+        os.replace(self.path, final_path)
+        self.path = final_path
+        self._claimed = True
+
+        decoder, self.decoder = self.decoder, None
+        if decoder:
+            decoder.end_input()
+        return decoder
+
+    def discard(self):
+        if self.decoder:
+            self.decoder.abort()
+            self.decoder = None
+        if not self._file.closed:
+            self._file.close()
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+        if not self._claimed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if not self._claimed:
+            self.discard()
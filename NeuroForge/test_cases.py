@@ -61,6 +61,16 @@ def test_languages_endpoint():
         print_test("Languages Endpoint", False, f"Error: {str(e)}")
         return False
 
+def wait_for_job(job, timeout=300):
+    """Poll a queued upload until it finishes and return the result response"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = requests.get(f"{API_BASE_URL}{job['status_url']}").json()
+        if status.get('status') in ('completed', 'failed'):
+            break
+        time.sleep(1)
+    return requests.get(f"{API_BASE_URL}{job['result_url']}")
+
 def test_file_upload(filename, target_language='hi'):
     """Test file upload and translation"""
     file_path = os.path.join(TEST_FILES_DIR, filename)
@@ -79,6 +89,8 @@ def test_file_upload(filename, target_language='hi'):
             
             start_time = time.time()
             response = requests.post(f"{API_BASE_URL}/upload", files=files, data=data)
+            if response.status_code == 202:
+                response = wait_for_job(response.json())
             end_time = time.time()
             
             if response.status_code == 200:
@@ -105,6 +117,42 @@ def test_file_upload(filename, target_language='hi'):
         print_test(f"File Upload: {filename}", False, f"Error: {str(e)}")
         return False
 
+def test_batch_upload(filename, target_languages=('hi', 'mr', 'ta')):
+    """Test one upload translated into several languages"""
+    file_path = os.path.join(TEST_FILES_DIR, filename)
+    
+    if not os.path.exists(file_path):
+        print_test(f"Batch Upload: {filename}", False, "File not found")
+        return False
+    
+    try:
+        print(f"🔄 Testing batch upload: {filename} → {', '.join(target_languages)}")
+        
+        with open(file_path, 'rb') as f:
+            files = {'file': f}
+            data = {'target_languages': ','.join(target_languages)}
+            
+            start_time = time.time()
+            response = requests.post(f"{API_BASE_URL}/upload_batch", files=files, data=data)
+            if response.status_code == 202:
+                response = wait_for_job(response.json())
+            end_time = time.time()
+            
+            if response.status_code == 200:
+                translations = response.json().get('translations', [])
+                voiced = sum(1 for t in translations if t.get('audio_available'))
+                print_test(f"Batch Upload: {filename}", len(translations) == len(target_languages),
+                          f"{len(translations)} languages ({voiced} voiced) in {end_time - start_time:.1f}s")
+                return len(translations) == len(target_languages)
+            else:
+                error_msg = response.json().get('error', 'Unknown error') if response.content else 'No response'
+                print_test(f"Batch Upload: {filename}", False, f"HTTP {response.status_code} - {error_msg}")
+                return False
+                
+    except Exception as e:
+        print_test(f"Batch Upload: {filename}", False, f"Error: {str(e)}")
+        return False
+
 def test_history_endpoint():
     """Test translation history"""
     try:
@@ -307,6 +355,10 @@ def run_complete_test_suite():
             passed_tests += 1
         time.sleep(2)  # Wait between uploads
     
+    total_tests += 1
+    if test_batch_upload("english_sample1.mp3"):
+        passed_tests += 1
+    
     # Step 4: Error handling tests
     error_passed = test_error_handling()
     total_tests += 3  # We have 3 error tests